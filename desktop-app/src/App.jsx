@@ -3,7 +3,24 @@ import Sidebar from "./components/Sidebar";
 import Header from "./components/Header";
 import StatusBadge from "./components/StatusBadge";
 import ConnectionPanel from "./components/ConnectionPanel";
-import { checkPcAgentStatus, fetchSystemMetrics, getPendingRequests, respondToConnection } from "./api";
+import { checkPcAgentStatus, fetchSystemMetrics, getPendingRequests, respondToConnection, getActiveConnections } from "./api";
+
+function formatBytes(bytes) {
+  if (bytes >= 1024 * 1024 * 1024) return `${(bytes / (1024 * 1024 * 1024)).toFixed(2)} GB`;
+  if (bytes >= 1024 * 1024) return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+  if (bytes >= 1024) return `${(bytes / 1024).toFixed(1)} KB`;
+  return `${bytes} B`;
+}
+
+// One-line traffic summary from the agent's per-session stats
+function formatStats(stats) {
+  if (!stats) return "No traffic yet";
+  const seconds = Math.max(0, Math.round(Date.now() / 1000 - stats.last_seen));
+  const latency = stats.latency_p50_ms !== null
+    ? ` • p50 ${stats.latency_p50_ms} ms / p99 ${stats.latency_p99_ms} ms`
+    : "";
+  return `↑ ${formatBytes(stats.bytes_out)} • ${stats.frames_sent} frames • ${stats.input_events} inputs${latency} • seen ${seconds}s ago`;
+}
 
 export default function App() {
   const [status, setStatus] = useState("Checking...");
@@ -46,10 +63,21 @@ export default function App() {
       }
     }
 
+    async function checkActiveConnections() {
+      const connections = await getActiveConnections();
+      if (mounted) {
+        // Heaviest uplink users first
+        setActiveConnections([...connections].sort(
+          (a, b) => (b.stats?.bytes_out || 0) - (a.stats?.bytes_out || 0)
+        ));
+      }
+    }
+
     async function checkAll() {
       await checkStatus();
       await checkMetrics();
       await checkConnectionRequests();
+      await checkActiveConnections();
     }
 
     checkAll();
@@ -74,10 +102,10 @@ export default function App() {
           const acceptedRequest = pendingConnections.find(req => req.id === requestId);
           if (acceptedRequest) {
             setActiveConnections(prev => [...prev, {
-              id: Date.now(),
-              deviceInfo: acceptedRequest.device_info,
-              connectedAt: new Date(),
-              code: acceptedRequest.code
+              code: acceptedRequest.code,
+              device_info: acceptedRequest.device_info,
+              connected_at: Date.now() / 1000,
+              stats: null
             }]);
           }
         }
@@ -125,11 +153,14 @@ export default function App() {
                   <p className="no-connections">No active connections</p>
                 ) : (
                   activeConnections.map(conn => (
-                    <div key={conn.id} className="connection-item">
-                      <div className="conn-device">{conn.deviceInfo}</div>
+                    <div key={conn.code} className="connection-item">
+                      <div>
+                        <div className="conn-device">{conn.device_info}</div>
+                        <div className="conn-stats">{formatStats(conn.stats)}</div>
+                      </div>
                       <div className="conn-status">
                         <span className="status-dot active"></span>
-                        Connected since {conn.connectedAt.toLocaleTimeString()}
+                        Connected since {new Date(conn.connected_at * 1000).toLocaleTimeString()}
                       </div>
                     </div>
                   ))
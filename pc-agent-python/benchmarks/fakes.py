@@ -0,0 +1,83 @@
+# File: benchmarks/fakes.py
+"""Synthetic grabber and input backends so the agent can run headless."""
+import sys
+import types
+
+
+class SyntheticGrabber:
+    """Drop-in replacement for ``ImageGrab.grab`` producing a fake desktop.
+
+    The base image is rendered once; every call paints a small moving block
+    on a copy so consecutive frames differ the way a lightly active desktop
+    does (set ``animate=False`` for a completely idle screen).
+    """
+
+    def __init__(self, width=1920, height=1080, animate=True):
+        from PIL import Image, ImageDraw
+
+        self.width = width
+        self.height = height
+        self.animate = animate
+        self.frames = 0
+
+        img = Image.new("RGB", (width, height), color=(30, 30, 30))
+        draw = ImageDraw.Draw(img)
+
+        # Left half: "editor" - flat background with rows of text
+        for row, y in enumerate(range(10, height, 18)):
+            draw.text((10, y), f"{row:04d}  def handler(request): return {{'status': 'ok'}}", fill=(220, 220, 220))
+
+        # Right half: "photo" - smooth gradient
+        for x in range(width // 2, width, 4):
+            shade = int(255 * (x - width // 2) / (width // 2))
+            draw.rectangle([x, 0, x + 3, height], fill=(shade, 120, 255 - shade))
+
+        self.base = img
+
+    def __call__(self):
+        self.frames += 1
+        if not self.animate:
+            return self.base.copy()
+
+        from PIL import ImageDraw
+
+        img = self.base.copy()
+        draw = ImageDraw.Draw(img)
+        x = (self.frames * 37) % max(1, self.width - 120)
+        draw.rectangle([x, 40, x + 120, 160], fill=(255, 200, 0))
+        return img
+
+
+def install_fake_input_backend(width=1920, height=1080):
+    """Register a no-op ``pyautogui`` module before the agent imports it.
+
+    Returns the fake module; ``calls`` counts every injected input event.
+    """
+    fake = types.ModuleType("pyautogui")
+    fake.calls = 0
+    fake.PAUSE = 0
+    fake.FAILSAFE = False
+    state = {"x": 0, "y": 0}
+
+    def _record(*args, **kwargs):
+        fake.calls += 1
+
+    def _move_to(x=0, y=0, *args, **kwargs):
+        fake.calls += 1
+        state["x"], state["y"] = int(x), int(y)
+
+    def _move_rel(dx=0, dy=0, *args, **kwargs):
+        fake.calls += 1
+        state["x"] += int(dx)
+        state["y"] += int(dy)
+
+    fake.size = lambda: (width, height)
+    fake.position = lambda: (state["x"], state["y"])
+    fake.moveTo = _move_to
+    fake.moveRel = _move_rel
+    for name in ("click", "doubleClick", "scroll", "mouseDown", "mouseUp",
+                 "hotkey", "press", "write", "typewrite", "keyDown", "keyUp"):
+        setattr(fake, name, _record)
+
+    sys.modules["pyautogui"] = fake
+    return fake
@@ -0,0 +1,322 @@
+# File: benchmarks/load_test.py
+"""Multi-device load test against a real, locally spawned agent.
+
+Starts the agent in a child process with the fakes from ``benchmarks/fakes.py``
+(synthetic screen, no-op pyautogui) so it runs headless, pairs every simulated
+phone through the real flow (generate-code → request → respond → status) and
+then drives viewers polling /mobile/screen and input senders posting mouse
+moves at fixed rates. Reports latency percentiles and throughput per traffic
+kind, plus the agent's CPU and RSS sampled over the run, as JSON.
+
+    python benchmarks/load_test.py --devices 20 --duration 30
+    python benchmarks/load_test.py --viewers 20 --senders 5 --fps 10 --input-rate 30
+
+Needs ``httpx`` and the agent requirements (uvicorn, psutil, qrcode, Pillow).
+Per-device rate limits still apply; raise them for the child with
+``--rate-limits frame=60:120`` to measure raw capacity instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if AGENT_DIR not in sys.path:
+    sys.path.insert(0, AGENT_DIR)
+
+from benchmarks.run_benchmarks import summarize_latencies
+
+
+# ---------------- Agent process ----------------
+def serve(host, port, width, height):
+    """Child process: the real agent app on the fake backends"""
+    from benchmarks.fakes import SyntheticGrabber, install_fake_input_backend
+    import uvicorn
+
+    install_fake_input_backend(width, height)
+    import main
+
+    main.screen.grabber = SyntheticGrabber(width, height)
+    uvicorn.run(main.app, host=host, port=port, log_level="warning")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_agent(port, width, height, rate_limits=None, verbose=False):
+    env = dict(os.environ)
+    if rate_limits:
+        env["SMARTDESK_RATE_LIMITS"] = rate_limits
+    command = [
+        sys.executable, os.path.abspath(__file__), "--serve",
+        "--port", str(port), "--width", str(width), "--height", str(height),
+    ]
+    # The agent logs every request; keep that out of the report unless asked
+    output = None if verbose else subprocess.DEVNULL
+    return subprocess.Popen(command, cwd=AGENT_DIR, env=env, stdout=output, stderr=output)
+
+
+async def wait_until_up(client, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Agent exited during startup (code {process.returncode})")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Agent did not start in time")
+
+
+# ---------------- Pairing ----------------
+async def pair_device(client, index):
+    """Real pairing flow; returns the session headers and the time it took"""
+    started = time.perf_counter()
+    code = (await client.get("/connection/generate-code")).json()["code"]
+    response = await client.post("/connection/request", json={
+        "code": code,
+        "device_info": f"load-test device {index}",
+    })
+    request_id = response.json()["request_id"]
+    await client.post("/connection/respond", json={"request_id": request_id, "accepted": True})
+    status = (await client.get(f"/connection/status/{code}")).json()
+    if not status.get("token"):
+        raise RuntimeError(f"Pairing failed for device {index}: {status}")
+    return {"Authorization": f"Bearer {status['token']}"}, time.perf_counter() - started
+
+
+# ---------------- Traffic ----------------
+class Recorder:
+    """Outcome counters and latencies for one kind of traffic"""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.rate_limited = 0
+        self.not_modified = 0
+        self.bytes = 0
+
+    def add(self, response, latency):
+        self.latencies.append(latency)
+        if response.status_code == 304:
+            self.not_modified += 1
+        elif response.status_code == 429:
+            self.rate_limited += 1
+        elif response.status_code >= 400:
+            self.errors += 1
+        self.bytes += len(response.content)
+
+    def report(self, elapsed):
+        return {
+            "requests": len(self.latencies),
+            "requests_per_second": round(len(self.latencies) / elapsed, 2) if elapsed else 0.0,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "not_modified": self.not_modified,
+            "megabytes_received": round(self.bytes / (1024**2), 2),
+            "latency": summarize_latencies(self.latencies),
+        }
+
+
+async def paced(rate, until, send):
+    """Call ``send`` ``rate`` times a second on a fixed schedule until ``until``.
+
+    After a slow response the client catches up on missed slots instead of
+    stretching the schedule, so an overloaded agent still sees the full load.
+    """
+    interval = 1.0 / rate
+    next_at = time.monotonic()
+    while next_at < until:
+        await send()
+        next_at += interval
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def viewer(client, headers, fps, until, recorder):
+    etag = None
+
+    async def poll():
+        nonlocal etag
+        request_headers = dict(headers, **({"If-None-Match": etag} if etag else {}))
+        started = time.perf_counter()
+        try:
+            response = await client.get("/mobile/screen", headers=request_headers)
+        except Exception:
+            recorder.errors += 1
+            return
+        recorder.add(response, time.perf_counter() - started)
+        etag = response.headers.get("etag", etag)
+
+    await paced(fps, until, poll)
+
+
+async def input_sender(client, headers, rate, until, recorder, index):
+    step = 0
+
+    async def send():
+        nonlocal step
+        step += 1
+        # Each device sweeps the pointer along its own offset
+        body = {"type": "mouse_move", "data": {"x": (index * 0.05 + step * 0.01) % 1, "y": 0.5}}
+        started = time.perf_counter()
+        try:
+            response = await client.post("/mobile/execute-command", headers=headers, json=body)
+        except Exception:
+            recorder.errors += 1
+            return
+        recorder.add(response, time.perf_counter() - started)
+
+    await paced(rate, until, send)
+
+
+async def sample_resources(pid, interval, until):
+    """Agent CPU (% of one core) and RSS over time"""
+    import psutil
+
+    process = psutil.Process(pid)
+    process.cpu_percent(None)
+    started = time.monotonic()
+    samples = []
+    while time.monotonic() < until:
+        await asyncio.sleep(interval)
+        try:
+            with process.oneshot():
+                samples.append({
+                    "t": round(time.monotonic() - started, 2),
+                    "cpu_percent": process.cpu_percent(None),
+                    "rss_mb": round(process.memory_info().rss / (1024**2), 1),
+                    "threads": process.num_threads(),
+                })
+        except psutil.NoSuchProcess:
+            break
+    return samples
+
+
+def summarize_resources(samples):
+    if not samples:
+        return {"samples": []}
+    cpu = [sample["cpu_percent"] for sample in samples]
+    rss = [sample["rss_mb"] for sample in samples]
+    return {
+        "cpu_percent_mean": round(sum(cpu) / len(cpu), 1),
+        "cpu_percent_max": max(cpu),
+        "rss_mb_start": rss[0],
+        "rss_mb_max": max(rss),
+        "rss_mb_end": rss[-1],
+        "samples": samples,
+    }
+
+
+async def run_load(args):
+    import httpx
+
+    port = args.port or free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = spawn_agent(port, args.width, args.height, args.rate_limits, args.verbose)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            await wait_until_up(client, process)
+
+            devices = max(args.viewers, args.senders)
+            pairings = [await pair_device(client, i) for i in range(devices)]
+            sessions = [headers for headers, _ in pairings]
+
+            viewers = Recorder()
+            inputs = Recorder()
+            started = time.monotonic()
+            until = started + args.duration
+            tasks = [viewer(client, sessions[i], args.fps, until, viewers) for i in range(args.viewers)]
+            tasks += [
+                input_sender(client, sessions[i], args.input_rate, until, inputs, i)
+                for i in range(args.senders)
+            ]
+            resources, *_ = await asyncio.gather(
+                sample_resources(process.pid, args.sample_interval, until), *tasks
+            )
+            elapsed = time.monotonic() - started
+
+        return {
+            "pairing": summarize_latencies([took for _, took in pairings]),
+            "viewers": viewers.report(elapsed),
+            "input": inputs.report(elapsed),
+            "agent": summarize_resources(resources),
+            "elapsed_s": round(elapsed, 2),
+        }
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartDesk PC agent multi-device load test")
+    parser.add_argument("--devices", type=int, help="Shorthand for --viewers N --senders N")
+    parser.add_argument("--viewers", type=int, default=10, help="Devices polling /mobile/screen")
+    parser.add_argument("--senders", type=int, default=10, help="Devices sending mouse moves")
+    parser.add_argument("--fps", type=float, default=10.0, help="Screen polls per second per viewer")
+    parser.add_argument("--input-rate", type=float, default=30.0, help="Input commands per second per sender")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load after pairing")
+    parser.add_argument("--width", type=int, default=1920, help="Synthetic screen width")
+    parser.add_argument("--height", type=int, default=1080, help="Synthetic screen height")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between CPU/RSS samples")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--rate-limits", help="SMARTDESK_RATE_LIMITS for the agent, e.g. frame=60:120")
+    parser.add_argument("--port", type=int, help="Agent port (default: a free one)")
+    parser.add_argument("--verbose", action="store_true", help="Show the agent's own logging")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve("127.0.0.1", args.port, args.width, args.height)
+        return
+
+    if args.devices:
+        args.viewers = args.senders = args.devices
+
+    results = asyncio.run(run_load(args))
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "viewers": args.viewers,
+            "senders": args.senders,
+            "fps": args.fps,
+            "input_rate": args.input_rate,
+            "duration_s": args.duration,
+            "screen": f"{args.width}x{args.height}",
+            "rate_limits": args.rate_limits,
+        },
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"📊 Load test results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
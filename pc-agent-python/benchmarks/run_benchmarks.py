@@ -0,0 +1,292 @@
+# File: benchmarks/run_benchmarks.py
+"""Reproducible benchmarks for the PC agent hot paths.
+
+Runs headless: the screen grabber and pyautogui are replaced by the fakes in
+``benchmarks/fakes.py`` unless ``--real-grabber`` is given (e.g. under Xvfb).
+Results are printed as JSON (or written with ``--output``) so they can be
+diffed between releases.
+
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --only capture --frames 50
+
+The endpoint suite needs ``httpx`` in addition to the agent requirements.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if AGENT_DIR not in sys.path:
+    sys.path.insert(0, AGENT_DIR)
+
+from benchmarks.fakes import SyntheticGrabber, install_fake_input_backend
+
+RESOLUTIONS = [(1280, 720), (1920, 1080), (2560, 1440), (3840, 2160)]
+QUALITIES = [50, 65, 80]
+ENCODERS = ["pillow", "turbo", "hybrid"]
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the agent's per-request print() logging while timing."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize_latencies(samples):
+    """Latency summary in milliseconds"""
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p90_ms": round(percentile(samples, 90) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+def data_url_size(data_url):
+    """Size in bytes of the image carried by a base64 data URL"""
+    payload = data_url.split(",", 1)[1]
+    return len(payload) * 3 // 4 - payload.count("=", -2)
+
+
+def frame_size(frame):
+    """Image bytes of a capture_frame() result (all layers of a tiled frame)"""
+    if "tiles" in frame:
+        return sum(data_url_size(layer) for layer in frame["tiles"]["layers"].values())
+    return data_url_size(frame["data_url"])
+
+
+# ---------------- ScreenCapture ----------------
+def bench_screen_capture(frames, real_grabber=False):
+    from core.screen_capture import ScreenCapture
+    from core.frame_encoder import get_encoder
+
+    results = []
+    resolutions = [None] if real_grabber else RESOLUTIONS
+    configs = [(encoder, quality) for encoder in ENCODERS for quality in QUALITIES]
+
+    for resolution in resolutions:
+        grabber = None if real_grabber else SyntheticGrabber(*resolution)
+        for encoder, quality in configs:
+            screen = ScreenCapture(grabber=grabber)
+            screen.set_quality(quality)
+
+            with quiet():
+                # Report the encoder actually used (turbo falls back to Pillow)
+                encoder = get_encoder(encoder).name
+                screen.set_encoder(encoder)
+                screen.capture_frame()  # warm-up
+                sizes = []
+                timings = []
+                for _ in range(frames):
+                    start = time.perf_counter()
+                    frame = screen.capture_frame()
+                    timings.append(time.perf_counter() - start)
+                    if frame:
+                        sizes.append(frame_size(frame))
+
+            total = sum(timings)
+            results.append({
+                "source": "real" if real_grabber else f"{resolution[0]}x{resolution[1]}",
+                "encoder": encoder,
+                "quality": quality,
+                "frames": frames,
+                "fps": round(frames / total, 2) if total else 0.0,
+                "bytes_per_frame": int(statistics.fmean(sizes)) if sizes else 0,
+                "latency": summarize_latencies(timings),
+            })
+    return results
+
+
+# ---------------- HTTP endpoints ----------------
+def _approve_session(manager, device_info="benchmark client"):
+    """Run the pairing flow on a ConnectionManager and return the code"""
+    code = manager.generate_connection_code()
+    request_id = manager.add_connection_request(code, device_info)
+    manager.handle_connection_response(request_id, True)
+    return code
+
+
+# Above this share of non-200 responses a result measures error paths, not the endpoint
+MAX_ERROR_RATE = 0.01
+
+
+async def _drive_endpoint(client, method, path, sessions, body, clients, requests_per_client):
+    latencies = []
+    errors = 0
+
+    async def worker(headers):
+        nonlocal errors
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            response = await client.request(method, path, headers=headers, json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(sessions[i]) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency": summarize_latencies(latencies),
+    }
+
+
+def bench_endpoints(concurrency, requests_per_client, real_grabber=False):
+    import httpx
+
+    install_fake_input_backend()
+    with quiet():
+        import main
+
+    if not real_grabber:
+        main.screen.grabber = SyntheticGrabber(1920, 1080)
+
+    # Raw capacity: per-client rate limits would turn most requests into 429s
+    main.rate_limiter.limits = {}
+
+    # One paired session per simulated client, as with real phones
+    sessions = []
+    with quiet():
+        for i in range(max(concurrency)):
+            code = _approve_session(main.connection_manager, f"benchmark client {i}")
+            sessions.append({"Authorization": f"Bearer {main.connection_manager.get_session_token(code)}"})
+
+    targets = {
+        "mobile_screen": ("GET", "/mobile/screen", None),
+        "mobile_execute_command": (
+            "POST", "/mobile/execute-command",
+            {"type": "mouse_move", "data": {"x": 0.5, "y": 0.5}},
+        ),
+    }
+
+    async def run():
+        results = {name: [] for name in targets}
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, (method, path, body) in targets.items():
+                for clients in concurrency:
+                    results[name].append(await _drive_endpoint(
+                        client, method, path, sessions, body, clients, requests_per_client
+                    ))
+        return results
+
+    with quiet():
+        results = asyncio.run(run())
+
+    failed = [
+        f"{name} @ {result['clients']} clients: {result['errors']}/{result['requests']} errors"
+        for name, runs in results.items()
+        for result in runs
+        if result["errors"] > MAX_ERROR_RATE * result["requests"]
+    ]
+    if failed:
+        raise RuntimeError("Endpoint benchmark invalid, too many failed requests: " + "; ".join(failed))
+    return results
+
+
+# ---------------- ConnectionManager ----------------
+def bench_auth_lookup(sessions, lookups):
+    from core.connection_manager import ConnectionManager
+
+    manager = ConnectionManager()
+    codes = []
+    with quiet():
+        for i in range(sessions):
+            code = f"{i:06d}"
+            request_id = manager.add_connection_request(code, f"device {i}")
+            manager.handle_connection_response(request_id, True)
+            codes.append(code)
+
+    rng = random.Random(1234)
+    hits = [rng.choice(codes) for _ in range(lookups)]
+    misses = [f"x{i:05d}" for i in range(lookups)]
+    tokens = [manager.tokens.mint(f"sid{i}", code, "device")["token"] for i, code in enumerate(hits)]
+    forged = [token[:-4] + "AAAA" for token in tokens]
+
+    def timed(check, sample):
+        start = time.perf_counter()
+        for item in sample:
+            check(item)
+        return (time.perf_counter() - start) / len(sample)
+
+    return {
+        "sessions": sessions,
+        "lookups": lookups,
+        "hit_us": round(timed(manager.is_connection_active, hits) * 1e6, 3),
+        "miss_us": round(timed(manager.is_connection_active, misses) * 1e6, 3),
+        "token_verify_us": round(timed(manager.verify_session_token, tokens) * 1e6, 3),
+        "token_reject_us": round(timed(manager.verify_session_token, forged) * 1e6, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartDesk PC agent benchmarks")
+    parser.add_argument("--only", choices=["capture", "endpoints", "auth"], action="append",
+                        help="Run only the given suite (repeatable)")
+    parser.add_argument("--frames", type=int, default=20, help="Frames per capture configuration")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16],
+                        help="Concurrent clients for the endpoint suite")
+    parser.add_argument("--requests", type=int, default=25, help="Requests per client")
+    parser.add_argument("--sessions", type=int, default=10000, help="Sessions for the auth suite")
+    parser.add_argument("--lookups", type=int, default=2000, help="Lookups for the auth suite")
+    parser.add_argument("--real-grabber", action="store_true",
+                        help="Capture the real display (e.g. under Xvfb) instead of synthetic frames")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    suites = args.only or ["capture", "endpoints", "auth"]
+    results = {}
+
+    if "capture" in suites:
+        results["screen_capture"] = bench_screen_capture(args.frames, args.real_grabber)
+    if "endpoints" in suites:
+        results["endpoints"] = bench_endpoints(args.concurrency, args.requests, args.real_grabber)
+    if "auth" in suites:
+        results["auth_lookup"] = bench_auth_lookup(args.sessions, args.lookups)
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "synthetic_grabber": not args.real_grabber,
+        },
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"📊 Benchmark results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
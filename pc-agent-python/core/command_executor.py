@@ -2,16 +2,46 @@ import os
 import subprocess
 import psutil
 import platform
-import pyautogui
+from core.file_transfer import file_transfer
+from core.file_index import file_index
+from core.disk_usage import disk_usage_analyzer
+from core.process_table import process_table
+from core.keyboard_injector import keyboard_injector
+from core.session_recorder import session_recorder
+
+_pyautogui = None
+
+def _gui():
+    """Import pyautogui on the first input command (it needs a display)"""
+    global _pyautogui
+    if _pyautogui is None:
+        import pyautogui
+        _pyautogui = pyautogui
+    return _pyautogui
 
 class CommandExecutor:
     def __init__(self):
         self.system = platform.system()
-        # Get screen size for absolute positioning
-        self.screen_width, self.screen_height = pyautogui.size()
+        self._screen_size = None
+
+    @property
+    def screen_size(self):
+        """Screen size for absolute positioning, queried once on first use"""
+        if self._screen_size is None:
+            self._screen_size = _gui().size()
+        return self._screen_size
+
+    @property
+    def screen_width(self):
+        return self.screen_size[0]
+
+    @property
+    def screen_height(self):
+        return self.screen_size[1]
     
-    def execute_command(self, command_type, command_data):
+    def execute_command(self, command_type, command_data, session=None):
         """Execute different types of commands from mobile"""
+        session_recorder.record_event(command_type, command_data, session)
         try:
             if command_type == "open_app":
                 return self.open_application(command_data)
@@ -20,9 +50,11 @@ class CommandExecutor:
             elif command_type == "system_info":
                 return self.get_system_info()
             elif command_type == "keyboard":
-                return self.simulate_keyboard(command_data)
+                return self.simulate_keyboard(command_data, session)
             elif command_type == "file_operation":
                 return self.file_operation(command_data)
+            elif command_type == "process_list":
+                return self.list_processes(command_data)
             # MOUSE COMMANDS
             elif command_type == "mouse_click":
                 return self.mouse_click(command_data)
@@ -53,9 +85,9 @@ class CommandExecutor:
             if "x" in data and "y" in data:
                 x = float(data["x"]) * self.screen_width
                 y = float(data["y"]) * self.screen_height
-                pyautogui.moveTo(x, y)
+                _gui().moveTo(x, y)
             
-            pyautogui.click(button=button)
+            _gui().click(button=button)
             return {"success": True, "message": f"Mouse {button} click"}
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -65,7 +97,7 @@ class CommandExecutor:
         try:
             x = float(data.get("x", 0)) * self.screen_width
             y = float(data.get("y", 0)) * self.screen_height
-            pyautogui.moveTo(x, y)
+            _gui().moveTo(x, y)
             return {"success": True, "message": f"Mouse moved to ({x}, {y})"}
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -75,7 +107,7 @@ class CommandExecutor:
         try:
             dx = float(data.get("dx", 0))
             dy = float(data.get("dy", 0))
-            pyautogui.moveRel(dx, dy)
+            _gui().moveRel(dx, dy)
             return {"success": True, "message": f"Mouse moved relative ({dx}, {dy})"}
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -88,7 +120,7 @@ class CommandExecutor:
             
             # Use vertical scrolling for dy (most common)
             if dy != 0:
-                pyautogui.scroll(int(dy))
+                _gui().scroll(int(dy))
             
             # Horizontal scrolling if supported
             if dx != 0:
@@ -104,7 +136,7 @@ class CommandExecutor:
         """Press and hold mouse button"""
         try:
             button = data.get("button", "left")
-            pyautogui.mouseDown(button=button)
+            _gui().mouseDown(button=button)
             return {"success": True, "message": f"Mouse {button} down"}
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -113,7 +145,7 @@ class CommandExecutor:
         """Release mouse button"""
         try:
             button = data.get("button", "left")
-            pyautogui.mouseUp(button=button)
+            _gui().mouseUp(button=button)
             return {"success": True, "message": f"Mouse {button} up"}
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -124,9 +156,9 @@ class CommandExecutor:
             if "x" in data and "y" in data:
                 x = float(data["x"]) * self.screen_width
                 y = float(data["y"]) * self.screen_height
-                pyautogui.moveTo(x, y)
+                _gui().moveTo(x, y)
             
-            pyautogui.doubleClick()
+            _gui().doubleClick()
             return {"success": True, "message": "Double click"}
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -194,33 +226,51 @@ class CommandExecutor:
                     "network_sent": f"{network_sent_mb}MB",
                     "network_received": f"{network_recv_mb}MB",
                     "os": platform.system(),
-                    "version": platform.version()
+                    "version": platform.version(),
+                    # Same values as numbers (see core/response_models.py)
+                    "cpu_percent": cpu_percent,
+                    "memory_used_gb": memory_used_gb,
+                    "memory_total_gb": memory_total_gb,
+                    "memory_percent": memory_percent,
+                    "disk_used_gb": disk_used_gb,
+                    "disk_total_gb": disk_total_gb,
+                    "disk_percent": disk_percent,
+                    "network_sent_mb": network_sent_mb,
+                    "network_received_mb": network_recv_mb
                 }
             }
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def simulate_keyboard(self, keys):
-        """Simulate keyboard shortcuts"""
+    def list_processes(self, data):
+        """Process list; pass back the returned version as "since" to get only changes"""
         try:
-            key_commands = {
-                "copy": "ctrl+c",
-                "paste": "ctrl+v",
-                "cut": "ctrl+x",
-                "select all": "ctrl+a",
-                "save": "ctrl+s",
-                "undo": "ctrl+z",
-                "redo": "ctrl+y",
-                "close window": "alt+f4",
-                "task manager": "ctrl+shift+esc",
-                "switch windows": "alt+tab"
-            }
-            
-            if keys.lower() in key_commands:
-                pyautogui.hotkey(*key_commands[keys.lower()].split('+'))
-                return {"success": True, "message": f"Executed: {keys}"}
-            else:
-                return {"success": False, "error": f"Unknown keyboard command: {keys}"}
+            result = process_table.get_processes((data or {}).get("since"))
+            return dict(result, success=True)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    def simulate_keyboard(self, keys, session=None, reorder=True):
+        """Type text and key combos.
+
+        ``keys`` is a shortcut name or combo ("copy", "ctrl+shift+t"), or a
+        dict with "text" and/or "keys" (a combo or list of combos), or with
+        "actions": [...] of those to mix them in order. An optional "seq"
+        (per session, from 1) keeps concurrent requests in typing order;
+        ``reorder=False`` refuses early seqs instead of waiting for the gap.
+        """
+        try:
+            if isinstance(keys, str):
+                result = keyboard_injector.inject([{"keys": keys}])
+                return dict(result, message=f"Executed: {keys}")
+
+            seq = keys.get("seq")
+            return keyboard_injector.inject(
+                keys.get("actions") or [keys],
+                session,
+                int(seq) if seq is not None else None,
+                reorder,
+            )
         except Exception as e:
             return {"success": False, "error": str(e)}
     
@@ -231,11 +281,29 @@ class CommandExecutor:
             path = operation.get("path")
             
             if op_type == "list_directory":
-                files = os.listdir(path)
-                return {"success": True, "files": files}
+                # "files" (names) as before, "entries" with sizes and mtimes
+                return dict(file_transfer.list_directory(path), success=True)
             elif op_type == "delete_file":
                 os.remove(path)
                 return {"success": True, "message": f"Deleted: {path}"}
+            elif op_type == "file_info":
+                # Size + validator for resumable downloads (/mobile/files/download)
+                return {"success": True, "file": file_transfer.file_info(path)}
+            elif op_type == "search_files":
+                # Name search over the background index; path optionally limits it to a subtree
+                result = file_index.search(
+                    operation.get("query"),
+                    mode=operation.get("mode", "substring"),
+                    limit=operation.get("limit", 50),
+                    root=path
+                )
+                return dict(result, success=True)
+            elif op_type == "disk_usage":
+                # Largest children of path; /mobile/files/disk-usage streams partial results
+                result = disk_usage_analyzer.analyze(
+                    path, top=operation.get("top", 50), refresh=bool(operation.get("refresh"))
+                )
+                return dict(result, success=True)
             else:
                 return {"success": False, "error": f"Unknown file operation: {op_type}"}
         except Exception as e:
@@ -1,18 +1,23 @@
 import random
 import string
 import time
-import qrcode
 import io
 import base64
 import socket
 import json
-from typing import Dict, Optional, List
+import uuid
+from typing import Optional, List
+from core.session_store import create_session_store
+from core.session_tokens import SessionTokenSigner
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_codes: Dict[str, dict] = {}
-        self.connection_requests: List[dict] = []
-        self.active_connections: List[dict] = []
+    def __init__(self, store=None):
+        # Codes, requests and active connections; a SQLite store lets several
+        # worker processes share them (see create_session_store)
+        self.store = store or create_session_store()
+        # Approved sessions get a signed token verified without touching the store
+        self.tokens = SessionTokenSigner()
+        self.revocation_sync_seconds = 2.0
         self.code_validity_minutes = 10
         self.code_length = 6
         self.current_code = None
@@ -37,11 +42,7 @@ class ConnectionManager:
             self.current_code = code
             
             # Store code with timestamp
-            self.active_codes[code] = {
-                'created_at': time.time(),
-                'used': False,
-                'connected_device': None
-            }
+            self.store.add_code(code, time.time())
             
             # Clean up expired codes
             self._cleanup_expired_codes()
@@ -54,29 +55,23 @@ class ConnectionManager:
     
     def _cleanup_expired_codes(self):
         """Remove expired codes"""
-        current_time = time.time()
-        expired_codes = []
-        
-        for code, data in self.active_codes.items():
-            if current_time - data['created_at'] > (self.code_validity_minutes * 60):
-                expired_codes.append(code)
+        cutoff = time.time() - (self.code_validity_minutes * 60)
+        expired_codes = self.store.delete_codes_created_before(cutoff)
         
-        for code in expired_codes:
-            del self.active_codes[code]
-            if self.current_code == code:
-                self.current_code = None
+        if self.current_code in expired_codes:
+            self.current_code = None
     
     def validate_code(self, code: str) -> bool:
         """Check if a connection code is valid"""
-        if code not in self.active_codes:
+        code_data = self.store.get_code(code)
+        if code_data is None:
             return False
         
-        code_data = self.active_codes[code]
         current_time = time.time()
         
         # Check if code expired
         if current_time - code_data['created_at'] > (self.code_validity_minutes * 60):
-            del self.active_codes[code]
+            self.store.delete_code(code)
             if self.current_code == code:
                 self.current_code = None
             return False
@@ -85,56 +80,79 @@ class ConnectionManager:
     
     def add_connection_request(self, code: str, device_info: str) -> int:
         """Add a new connection request and return request ID"""
-        request_id = len(self.connection_requests)
-        self.connection_requests.append({
-            'id': request_id,
-            'code': code,
-            'device_info': device_info,
-            'timestamp': time.time(),
-            'status': 'pending'  # pending, accepted, rejected
-        })
-        return request_id
+        return self.store.add_request(code, device_info, time.time())
     
     def get_pending_requests(self) -> List[dict]:
         """Get all pending connection requests"""
-        return [req for req in self.connection_requests if req['status'] == 'pending']
+        return self.store.list_requests('pending')
     
     def handle_connection_response(self, request_id: int, accepted: bool):
         """Handle user response to connection request"""
-        for req in self.connection_requests:
-            if req['id'] == request_id:
-                if accepted:
-                    req['status'] = 'accepted'
-                    # Mark code as used
-                    if req['code'] in self.active_codes:
-                        self.active_codes[req['code']]['used'] = True
-                        self.active_codes[req['code']]['connected_device'] = req['device_info']
-                    # Add to active connections
-                    self.active_connections.append({
-                        'device_info': req['device_info'],
-                        'connected_at': time.time(),
-                        'code': req['code']
-                    })
-                    print(f"✅ Connection accepted: {req['device_info']}")
-                else:
-                    req['status'] = 'rejected'
-                    print(f"❌ Connection rejected: {req['device_info']}")
-                break
+        req = self.store.get_request(request_id)
+        if req is None:
+            return
+        
+        if accepted:
+            self.store.set_request_status(request_id, 'accepted')
+            # Mark code as used
+            self.store.mark_code_used(req['code'], req['device_info'])
+            # Add to active connections with a signed session token
+            session_id = uuid.uuid4().hex
+            token = self.tokens.mint(session_id, req['code'], req['device_info'])['token']
+            self.store.add_connection({
+                'device_info': req['device_info'],
+                'connected_at': time.time(),
+                'code': req['code'],
+                'session_id': session_id,
+                'token': token
+            })
+            print(f"✅ Connection accepted: {req['device_info']}")
+        else:
+            self.store.set_request_status(request_id, 'rejected')
+            print(f"❌ Connection rejected: {req['device_info']}")
     
     def is_connection_active(self, code: str) -> bool:
         """Check if a code has an active connection"""
-        for conn in self.active_connections:
-            if conn['code'] == code:
-                return True
-        return False
+        return self.store.has_connection(code)
+    
+    def get_session_token(self, code: str) -> Optional[str]:
+        """Token minted when the connection for this code was approved"""
+        for conn in self.store.list_connections():
+            if conn['code'] == code and conn.get('token'):
+                return conn['token']
+        return None
+    
+    def verify_session_token(self, token: str) -> Optional[dict]:
+        """Claims of a valid session token (CPU only, never touches the store)"""
+        return self.tokens.verify(token)
+
+    def sync_revocations(self):
+        """Pick up tokens revoked by other worker processes (blocking store read;
+        the agent runs it every revocation_sync_seconds off the event loop)"""
+        self.tokens.set_revoked(self.store.list_revocations(time.time()))
+    
+    def disconnect(self, code: str) -> int:
+        """End the connection(s) for a code and revoke their session tokens"""
+        removed = self.store.remove_connections(code)
+        for conn in removed:
+            if conn.get('session_id'):
+                expires_at = time.time() + self.tokens.ttl_seconds
+                self.store.add_revocation(conn['session_id'], expires_at, time.time())
+                self.tokens.revoke(conn['session_id'], expires_at)
+            print(f"🔌 Connection ended: {conn['device_info']}")
+        return len(removed)
     
     def get_active_connections(self) -> List[dict]:
-        """Get all active connections"""
-        return self.active_connections
+        """Get all active connections (tokens are never exposed here)"""
+        return [
+            {key: value for key, value in conn.items() if key != 'token'}
+            for conn in self.store.list_connections()
+        ]
     
     def generate_qr_code(self, code: str) -> str:
         """Generate QR code as base64 string containing connection info"""
         try:
+            import qrcode  # deferred: only the desktop pairing screen needs it
             local_ip = self.get_local_ip()
             qr_data = json.dumps({
                 "type": "smartdesk_connection",
@@ -185,9 +203,7 @@ class ConnectionManager:
     
     def get_code_status(self, code: str) -> Optional[dict]:
         """Get status of a connection code"""
-        if code in self.active_codes:
-            return self.active_codes[code]
-        return None
+        return self.store.get_code(code)
 
 # Global instance
 connection_manager = ConnectionManager()
\ No newline at end of file
@@ -0,0 +1,47 @@
+# File: core/cursor_tracker.py
+import threading
+import time
+import pyautogui
+
+class CursorTracker:
+    """Samples the pointer position for the lightweight cursor channel.
+
+    Screen grabs don't include the cursor (ImageGrab leaves it out on every
+    platform), so pointer movement never changes a frame; clients draw the
+    cursor themselves from these samples.
+    """
+
+    def __init__(self, min_interval=1 / 240):
+        # Viewers polling inside this window share one sample
+        self.min_interval = min_interval
+        self.screen_width, self.screen_height = pyautogui.size()
+        self._lock = threading.Lock()
+        self._last_sample = None
+        self._last_time = 0.0
+        self._seq = 0
+
+    def sample(self) -> dict:
+        """Current pointer position, normalized 0-1 like the mouse commands"""
+        now = time.monotonic()
+        with self._lock:
+            if self._last_sample and now - self._last_time < self.min_interval:
+                return self._last_sample
+
+            x, y = pyautogui.position()
+            if self._last_sample is None or (x, y) != (self._last_sample["px"], self._last_sample["py"]):
+                self._seq += 1
+
+            self._last_sample = {
+                "type": "cursor",
+                "seq": self._seq,  # only bumps when the pointer actually moved
+                "x": round(x / self.screen_width, 5),
+                "y": round(y / self.screen_height, 5),
+                "px": x,
+                "py": y,
+                "timestamp": time.time(),
+            }
+            self._last_time = now
+            return self._last_sample
+
+# Global instance
+cursor_tracker = CursorTracker()
@@ -0,0 +1,188 @@
+# File: core/disk_usage.py
+"""Parallel "what filled my disk" analyzer.
+
+Directories are listed by a pool of ``os.scandir`` workers. Each listing is
+cached together with the directory's mtime; on the next query a directory
+whose mtime is unchanged is only stat()ed, not re-listed, so repeat scans cost
+one stat per directory instead of one per file. File size changes that don't
+touch the directory entry (a growing log file) are picked up once a listing
+is older than ``max_age``, or on a scan with ``refresh=True``. The cache
+holds at most ``max_entries`` directories and evicts the least recently
+used ones.
+
+Like ``du -x`` the walk stays on one filesystem (no /proc, /sys or network
+mounts below the scanned path), and sizes are allocated blocks where the
+platform reports them, so sparse files count what they really use.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterator, Optional
+
+
+# Cached directory listings kept across scans (a few hundred bytes each)
+MAX_CACHED_DIRS = 100_000
+# Seconds a listing is trusted on mtime alone before it is re-measured
+MAX_LISTING_AGE = 300.0
+
+
+def _disk_size(stat) -> int:
+    """Bytes allocated on disk; st_blocks is in 512-byte units (absent on Windows)"""
+    blocks = getattr(stat, "st_blocks", None)
+    return blocks * 512 if blocks is not None else stat.st_size
+
+
+class DiskUsageAnalyzer:
+    def __init__(self, workers: Optional[int] = None, max_entries: int = MAX_CACHED_DIRS,
+                 max_age: float = MAX_LISTING_AGE):
+        self.workers = workers or min(16, (os.cpu_count() or 2) * 2)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        # dir path → {"mtime", "listed_at", "files_size", "file_count", "subdirs"}, least recently used first
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _cached(self, path: str) -> Optional[dict]:
+        with self._cache_lock:
+            listing = self._cache.get(path)
+            if listing is not None:
+                self._cache.move_to_end(path)
+            return listing
+
+    def _remember(self, path: str, listing: Optional[dict]):
+        with self._cache_lock:
+            if listing is None:
+                self._cache.pop(path, None)
+                return
+            self._cache[path] = listing
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _load_dir(self, path: str, refresh: bool = False) -> Optional[dict]:
+        """Direct contents of one directory, from cache when its mtime is unchanged
+        and the listing is recent (``refresh`` always re-lists)"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._remember(path, None)
+            return None
+        mtime = stat.st_mtime
+        now = time.monotonic()
+
+        cached = None if refresh else self._cached(path)
+        if cached and cached["mtime"] == mtime and now - cached["listed_at"] < self.max_age:
+            return dict(cached, cached=True)
+
+        files_size = 0
+        file_count = 0
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        entry_stat = entry.stat(follow_symlinks=False)
+                        if entry.is_dir(follow_symlinks=False):
+                            # Mount point of another filesystem: not descended (du -x)
+                            if entry_stat.st_dev == stat.st_dev:
+                                subdirs.append(entry.path)
+                        else:
+                            files_size += _disk_size(entry_stat)
+                            file_count += 1
+                    except OSError:
+                        continue
+        except OSError:
+            self._remember(path, None)
+            return None
+
+        listing = {"mtime": mtime, "listed_at": now, "files_size": files_size,
+                   "file_count": file_count, "subdirs": subdirs}
+        self._remember(path, listing)
+        return dict(listing, cached=False)
+
+    def _subtree(self, path: str) -> tuple:
+        """(size, file count) of a fully scanned subtree, summed from the cache"""
+        size = 0
+        count = 0
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            # Evicted mid-scan (subtree larger than the cache): list it again
+            listing = self._cached(directory) or self._load_dir(directory)
+            if listing:
+                size += listing["files_size"]
+                count += listing["file_count"]
+                stack.extend(listing["subdirs"])
+        return size, count
+
+    def scan(self, path: str, top: int = 50, refresh: bool = False) -> Iterator[dict]:
+        """Scan ``path``; yields one ``partial`` event per finished child
+        directory, then a ``done`` event with the largest children.
+        ``refresh`` re-measures every directory instead of trusting the cache."""
+        path = os.path.abspath(path)
+        started = time.perf_counter()
+        stats = {"dirs": 0, "listed": 0}
+
+        root = self._load_dir(path, refresh)
+        if root is None:
+            raise FileNotFoundError(f"Cannot read directory: {path}")
+
+        # Every directory below a child of ``path`` is tracked against that child
+        outstanding = {child: 1 for child in root["subdirs"]}
+        finished = []
+
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="disk-usage") as pool:
+            pending = {pool.submit(self._load_dir, child, refresh): (child, child) for child in root["subdirs"]}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    directory, owner = pending.pop(future)
+                    listing = future.result()
+                    stats["dirs"] += 1
+                    if listing:
+                        stats["listed"] += 0 if listing["cached"] else 1
+                        for subdir in listing["subdirs"]:
+                            pending[pool.submit(self._load_dir, subdir, refresh)] = (subdir, owner)
+                        outstanding[owner] += len(listing["subdirs"])
+
+                    outstanding[owner] -= 1
+                    if outstanding[owner] == 0:
+                        size, count = self._subtree(owner)
+                        child = {"path": owner, "name": os.path.basename(owner), "size": size, "file_count": count}
+                        finished.append(child)
+                        yield dict(child, type="partial")
+
+        finished.append({
+            "path": path,
+            "name": "(files in this folder)",
+            "size": root["files_size"],
+            "file_count": root["file_count"],
+        })
+        finished.sort(key=lambda item: item["size"], reverse=True)
+
+        yield {
+            "type": "done",
+            "path": path,
+            "total_size": sum(item["size"] for item in finished),
+            "file_count": sum(item["file_count"] for item in finished),
+            "children": finished[:top],
+            "directories_scanned": stats["dirs"] + 1,
+            "directories_listed": stats["listed"] + (0 if root["cached"] else 1),
+            "took_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def analyze(self, path: str, top: int = 50, refresh: bool = False) -> dict:
+        """Run a scan to completion and return the final result"""
+        result = None
+        for event in self.scan(path, top, refresh):
+            result = event
+        return result
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+# Global instance
+disk_usage_analyzer = DiskUsageAnalyzer()
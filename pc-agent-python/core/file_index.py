@@ -0,0 +1,361 @@
+# File: core/file_index.py
+"""On-disk filename index for instant remote file search.
+
+The configured roots are walked once by a pool of ``os.scandir`` workers and
+stored in SQLite. Afterwards a poller re-reads only directories whose mtime
+changed (a directory's mtime moves whenever an entry is added, removed or
+renamed), so the index stays current without re-walking everything.
+Substring search uses an FTS5 trigram index when SQLite provides one.
+"""
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Optional
+
+DEFAULT_EXCLUDES = {".git", "node_modules", "__pycache__", ".cache", "$Recycle.Bin", "System Volume Information"}
+
+
+def _default_roots() -> List[str]:
+    roots = os.environ.get("SMARTDESK_INDEX_ROOTS")
+    if roots:
+        return [root for root in roots.split(os.pathsep) if root]
+    return [os.path.expanduser("~")]
+
+
+def _default_db_path() -> str:
+    return os.environ.get(
+        "SMARTDESK_INDEX_PATH",
+        os.path.join(os.path.expanduser("~"), ".smartdesk", "file_index.db")
+    )
+
+
+def _subtree_bounds(path: str):
+    """Key range covering every path below ``path`` (uses the path index)"""
+    prefix = path.rstrip(os.sep) + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+class FileIndex:
+    def __init__(self, db_path: Optional[str] = None, roots: Optional[List[str]] = None,
+                 workers: Optional[int] = None, poll_interval: float = 30.0):
+        self.db_path = db_path or _default_db_path()
+        self.roots = [os.path.abspath(root) for root in (roots or _default_roots())]
+        self.workers = workers or min(16, (os.cpu_count() or 2) * 2)
+        self.poll_interval = poll_interval
+        self.exclude = set(DEFAULT_EXCLUDES)
+        self.exclude.update(filter(None, os.environ.get("SMARTDESK_INDEX_EXCLUDE", "").split(os.pathsep)))
+
+        self.building = False
+        self.has_trigram = False
+        self.last_refresh = None
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    # ---------------- storage ----------------
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _init_schema(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        db = self._db()
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                dir TEXT NOT NULL,
+                name TEXT NOT NULL,
+                name_lower TEXT NOT NULL,
+                is_dir INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS files_name ON files (name_lower);
+            CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        try:
+            db.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+                    name_lower, content='files', content_rowid='id', tokenize='trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS files_ai AFTER INSERT ON files BEGIN
+                    INSERT INTO files_fts (rowid, name_lower) VALUES (new.id, new.name_lower);
+                END;
+                CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN
+                    INSERT INTO files_fts (files_fts, rowid, name_lower) VALUES ('delete', old.id, old.name_lower);
+                END;
+            """)
+            self.has_trigram = True
+        except sqlite3.OperationalError:
+            # SQLite < 3.34 or built without FTS5: substring search falls back to LIKE
+            self.has_trigram = False
+
+    def _insert_entries(self, db, entries):
+        db.executemany("""
+            INSERT INTO files (path, dir, name, name_lower, is_dir, size, mtime)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime
+        """, entries)
+
+    def _remove_tree(self, db, path: str):
+        low, high = _subtree_bounds(path)
+        db.execute("DELETE FROM files WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+        db.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+
+    # ---------------- scanning ----------------
+    def _scan_dir(self, path: str):
+        """List one directory: (path, mtime, entries, subdirs); mtime None if unreadable"""
+        entries = []
+        subdirs = []
+        try:
+            mtime = os.stat(path).st_mtime
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.name in self.exclude:
+                        continue
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    entries.append((entry.path, path, entry.name, entry.name.lower(),
+                                    int(is_dir), 0 if is_dir else stat.st_size, stat.st_mtime))
+                    if is_dir:
+                        subdirs.append(entry.path)
+        except OSError:
+            return path, None, [], []
+        return path, mtime, entries, subdirs
+
+    def _walk(self, db, roots: List[str]):
+        """Parallel breadth-first walk writing every directory it reaches"""
+        batch = []
+        dir_rows = []
+        last_beat = time.monotonic()
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="file-index") as pool:
+            pending = {pool.submit(self._scan_dir, root) for root in roots}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, mtime, entries, subdirs = future.result()
+                    if mtime is None:
+                        continue
+                    batch.extend(entries)
+                    dir_rows.append((path, mtime))
+                    for subdir in subdirs:
+                        pending.add(pool.submit(self._scan_dir, subdir))
+
+                if len(batch) >= 5000:
+                    self._flush(db, batch, dir_rows)
+                    batch, dir_rows = [], []
+                if time.monotonic() - last_beat > self.poll_interval:
+                    # A long initial walk must not look like a dead indexer
+                    self._heartbeat(db)
+                    last_beat = time.monotonic()
+        self._flush(db, batch, dir_rows)
+
+    def _flush(self, db, entries, dir_rows):
+        if not entries and not dir_rows:
+            return
+        db.execute("BEGIN")
+        try:
+            self._insert_entries(db, entries)
+            db.executemany("INSERT OR REPLACE INTO dirs (path, mtime) VALUES (?, ?)", dir_rows)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def unindexed_roots(self) -> List[str]:
+        """Roots whose first full walk hasn't finished, in any worker process"""
+        db = self._db()
+        return [root for root in self.roots
+                if db.execute("SELECT 1 FROM meta WHERE key = ?", (f"root:{root}",)).fetchone() is None]
+
+    def build(self):
+        """Full walk of roots that aren't indexed yet.
+
+        A root counts as indexed only once its whole walk has finished (the
+        'root:<path>' meta row); its dirs row is written early in the walk,
+        so an interrupted build is redone rather than taken as complete.
+        """
+        db = self._db()
+        missing = self.unindexed_roots()
+        if not missing:
+            return
+
+        self.building = True
+        started = time.time()
+        try:
+            with self._write_lock:
+                self._walk(db, missing)
+                db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               [(f"root:{root}", str(time.time())) for root in missing])
+            print(f"🗂️ Indexed {', '.join(missing)} in {time.time() - started:.1f}s")
+        finally:
+            self.building = False
+
+    def refresh(self) -> int:
+        """Apply changes since the last pass; returns how many directories changed"""
+        db = self._db()
+        known = db.execute("SELECT path, mtime FROM dirs").fetchall()
+
+        def changed(row):
+            try:
+                return os.stat(row[0]).st_mtime != row[1]
+            except OSError:
+                return True  # gone
+
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="file-index") as pool:
+            stale = [row[0] for row, is_changed in zip(known, pool.map(changed, known, chunksize=256)) if is_changed]
+
+        last_beat = time.monotonic()
+        with self._write_lock:
+            for path in stale:
+                self._refresh_dir(db, path)
+                if time.monotonic() - last_beat > self.poll_interval:
+                    self._heartbeat(db)
+                    last_beat = time.monotonic()
+        self.last_refresh = time.time()
+        return len(stale)
+
+    def _refresh_dir(self, db, path: str):
+        _, mtime, entries, subdirs = self._scan_dir(path)
+        db.execute("BEGIN")
+        try:
+            if mtime is None:
+                self._remove_tree(db, path)
+                db.execute("COMMIT")
+                return
+
+            existing = dict(db.execute("SELECT path, is_dir FROM files WHERE dir = ?", (path,)).fetchall())
+            current = {entry[0] for entry in entries}
+            for gone in set(existing) - current:
+                if existing[gone]:
+                    self._remove_tree(db, gone)
+                db.execute("DELETE FROM files WHERE path = ?", (gone,))
+
+            self._insert_entries(db, entries)
+            db.execute("INSERT OR REPLACE INTO dirs (path, mtime) VALUES (?, ?)", (path, mtime))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+        # Brand-new directories need a full walk of their own
+        new_dirs = [subdir for subdir in subdirs if subdir not in existing]
+        if new_dirs:
+            self._walk(db, new_dirs)
+
+    # ---------------- background indexer ----------------
+    def _claim_indexer(self) -> bool:
+        """Only one process (of several workers) builds and polls at a time"""
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT value FROM meta WHERE key = 'indexer'").fetchone()
+            owner_pid, heartbeat = (row[0].split(":") if row else ("0", "0"))
+            if int(owner_pid) == os.getpid() or now - float(heartbeat) > self.poll_interval * 3:
+                db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('indexer', ?)",
+                           (f"{os.getpid()}:{now}",))
+                db.execute("COMMIT")
+                return True
+            db.execute("COMMIT")
+            return False
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def _heartbeat(self, db):
+        """Refresh this process's indexer claim during long builds and refreshes"""
+        db.execute("UPDATE meta SET value = ? WHERE key = 'indexer' AND value LIKE ?",
+                   (f"{os.getpid()}:{time.time()}", f"{os.getpid()}:%"))
+
+    def _indexer_loop(self):
+        while True:
+            try:
+                if self._claim_indexer():
+                    self.build()
+                    self.refresh()
+            except Exception as e:
+                print(f"❌ File index error: {e}")
+            time.sleep(self.poll_interval)
+
+    def ensure_started(self):
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            self._init_schema()
+            threading.Thread(target=self._indexer_loop, name="file-indexer", daemon=True).start()
+            self._started = True
+
+    # ---------------- queries ----------------
+    def search(self, query: str, mode: str = "substring", limit: int = 50, root: Optional[str] = None) -> dict:
+        """Find files by name; ``mode`` is ``prefix`` or ``substring``"""
+        self.ensure_started()
+        started = time.perf_counter()
+        needle = (query or "").lower()
+        if not needle:
+            raise ValueError("Search query is required")
+        limit = max(1, min(1000, int(limit)))
+
+        columns = "f.path, f.name, f.is_dir, f.size, f.mtime"
+        where = []
+        params = []
+        if root:
+            low, high = _subtree_bounds(os.path.abspath(root))
+            where.append("f.path >= ? AND f.path < ?")
+            params += [low, high]
+
+        if mode == "prefix":
+            sql = f"SELECT {columns} FROM files f WHERE f.name_lower >= ? AND f.name_lower < ?"
+            params = [needle, needle + "\uffff"] + params
+        elif mode == "substring" and self.has_trigram and len(needle) >= 3:
+            sql = f"SELECT {columns} FROM files_fts JOIN files f ON f.id = files_fts.rowid WHERE files_fts MATCH ?"
+            params = ['"' + needle.replace('"', '""') + '"'] + params
+        elif mode == "substring":
+            sql = f"SELECT {columns} FROM files f WHERE f.name_lower LIKE ? ESCAPE '\\'"
+            escaped = needle.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params = [f"%{escaped}%"] + params
+        else:
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        if where:
+            sql += " AND " + " AND ".join(where)
+        sql += " LIMIT ?"
+        params.append(limit)
+
+        rows = self._db().execute(sql, params).fetchall()
+        return {
+            "results": [
+                {"path": path, "name": name, "is_dir": bool(is_dir), "size": size, "modified": mtime}
+                for path, name, is_dir, size, mtime in rows
+            ],
+            "took_ms": round((time.perf_counter() - started) * 1000, 2),
+            # From the shared database: another worker may be doing the build,
+            # and right after ensure_started() this process's build hasn't begun
+            "indexing": bool(self.unindexed_roots()),
+            "last_refresh": self.last_refresh,
+        }
+
+# Global instance
+file_index = FileIndex()
@@ -0,0 +1,162 @@
+# File: core/file_transfer.py
+import hashlib
+import os
+from typing import Iterator, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB - memory stays flat whatever the file size
+PART_SUFFIX = ".part"
+
+
+class RangeNotSatisfiable(Exception):
+    """Requested byte range lies outside the file (HTTP 416)"""
+
+
+class UploadIncomplete(Exception):
+    """Fewer (or more) bytes received than the client declared; resume, don't finalize"""
+
+
+class FileTransfer:
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def file_info(self, path: str) -> dict:
+        """Size, mtime and validator used for resume/If-Range"""
+        stat = os.stat(path)
+        return {
+            "path": path,
+            "size": stat.st_size,
+            "modified": stat.st_mtime,
+            "etag": f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+        }
+
+    def list_directory(self, path: str) -> dict:
+        """Names plus size / mtime / type of each entry (one scandir pass)"""
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                    is_dir = entry.is_dir()
+                except OSError:
+                    # Broken symlink or no permission: still list the name
+                    entries.append({"name": entry.name, "is_dir": False, "size": 0, "modified": 0.0})
+                    continue
+                entries.append({
+                    "name": entry.name,
+                    "is_dir": is_dir,
+                    "size": 0 if is_dir else stat.st_size,
+                    "modified": stat.st_mtime,
+                })
+        return {
+            "path": path,
+            "files": [entry["name"] for entry in entries],
+            "entries": entries,
+        }
+
+    def parse_range(self, header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+        """Parse a single ``bytes=`` range into inclusive (start, end).
+
+        Returns None when the header is absent or not something we serve as a
+        range (multiple ranges, other units) - the caller sends the whole file.
+        """
+        if not header or not header.startswith("bytes=") or "," in header:
+            return None
+        if file_size == 0:
+            # No byte of an empty file can be addressed, suffix ranges included
+            raise RangeNotSatisfiable(header)
+
+        start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+        try:
+            if start_text == "":
+                # Suffix range: last N bytes
+                length = int(end_text)
+                if length <= 0:
+                    raise RangeNotSatisfiable(header)
+                return max(0, file_size - length), file_size - 1
+
+            start = int(start_text)
+            end = int(end_text) if end_text else file_size - 1
+        except ValueError:
+            return None
+
+        if start >= file_size or end < start:
+            raise RangeNotSatisfiable(header)
+        return start, min(end, file_size - 1)
+
+    def iter_file(self, path: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the bytes start..end (inclusive) of a file in chunks"""
+        with open(path, "rb") as f:
+            if end is None:
+                end = os.fstat(f.fileno()).st_size - 1
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def checksum(self, path: str, algorithm: str = "sha256", start: int = 0, end: Optional[int] = None) -> dict:
+        """Hash a file (or a byte range of it) incrementally, chunk by chunk"""
+        if algorithm not in hashlib.algorithms_available:
+            raise ValueError(f"Unknown hash algorithm: {algorithm}")
+
+        digest = hashlib.new(algorithm)
+        size = 0
+        for chunk in self.iter_file(path, start, end):
+            digest.update(chunk)
+            size += len(chunk)
+        return {"path": path, "algorithm": algorithm, "start": start, "length": size, "digest": digest.hexdigest()}
+
+    # ---- uploads ----
+    def part_path(self, path: str) -> str:
+        return path + PART_SUFFIX
+
+    def upload_status(self, path: str) -> dict:
+        """How much of an interrupted upload has arrived; resume from ``received``"""
+        part = self.part_path(path)
+        received = os.path.getsize(part) if os.path.exists(part) else 0
+        return {"path": path, "received": received, "complete": os.path.exists(path) and received == 0}
+
+    def open_upload(self, path: str, offset: int):
+        """Open the partial file for writing at ``offset``.
+
+        The offset must match what was already received, so a retried or
+        reordered request can't leave a hole or overwrite good data. Offset 0
+        always starts the upload over.
+        """
+        received = self.upload_status(path)["received"]
+        if offset and offset != received:
+            raise ValueError(f"Upload offset {offset} does not match received size {received}")
+
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        return open(self.part_path(path), "ab" if offset else "wb")
+
+    def finish_upload(self, path: str, expected_digest: Optional[str] = None, algorithm: str = "sha256",
+                      expected_size: Optional[int] = None) -> dict:
+        """Verify the assembled file and move it into place.
+
+        Needs ``expected_digest`` or ``expected_size``: without either, a
+        truncated upload would replace the destination unnoticed.
+        """
+        if not expected_digest and expected_size is None:
+            raise ValueError("A sha256 or size is required to complete an upload")
+
+        part = self.part_path(path)
+        received = os.path.getsize(part)
+        if expected_size is not None and received != expected_size:
+            raise UploadIncomplete(f"Received {received} of {expected_size} bytes")
+
+        result = self.checksum(part, algorithm)
+        if expected_digest and result["digest"] != expected_digest.lower():
+            os.remove(part)
+            raise ValueError(f"Checksum mismatch: expected {expected_digest}, got {result['digest']}")
+
+        os.replace(part, path)
+        result["path"] = path
+        return result
+
+# Global instance
+file_transfer = FileTransfer()
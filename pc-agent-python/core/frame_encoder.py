@@ -0,0 +1,254 @@
+# File: core/frame_encoder.py
+import base64
+import io
+import json
+import os
+from typing import Dict, List, Optional
+
+# Chroma subsampling modes understood by every encoder
+SUBSAMPLING_MODES = ("4:4:4", "4:2:2", "4:2:0", "gray")
+
+
+class PillowJpegEncoder:
+    """Baseline JPEG encoder using Pillow (always available)"""
+    name = "pillow"
+    mime_type = "image/jpeg"
+
+    def __init__(self, subsampling: str = "4:2:0", optimize: bool = False):
+        self.subsampling = subsampling
+        # optimize=True runs an extra Huffman pass per frame - too slow for streaming
+        self.optimize = optimize
+
+    def encode(self, image, quality: int) -> bytes:
+        if self.subsampling == "gray":
+            image = image.convert("L")
+            options = {}
+        else:
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            options = {"subsampling": self.subsampling}
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=self.optimize, **options)
+        return buffer.getvalue()
+
+
+class TurboJpegEncoder:
+    """libjpeg-turbo encoder via PyTurboJPEG (SIMD DCT, no Pillow save overhead)"""
+    name = "turbo"
+    mime_type = "image/jpeg"
+
+    def __init__(self, subsampling: str = "4:2:0", fast_dct: bool = True):
+        # Raises ImportError / RuntimeError / OSError when the library is missing
+        import numpy as np
+        from turbojpeg import (TurboJPEG, TJPF_RGB, TJPF_GRAY, TJSAMP_444,
+                               TJSAMP_422, TJSAMP_420, TJSAMP_GRAY, TJFLAG_FASTDCT)
+
+        self._np = np
+        self._jpeg = TurboJPEG()
+        self._pixel_formats = {"RGB": TJPF_RGB, "L": TJPF_GRAY}
+        self._samp = {
+            "4:4:4": TJSAMP_444,
+            "4:2:2": TJSAMP_422,
+            "4:2:0": TJSAMP_420,
+            "gray": TJSAMP_GRAY,
+        }
+        self.subsampling = subsampling
+        self.flags = TJFLAG_FASTDCT if fast_dct else 0
+
+    def encode(self, image, quality: int) -> bytes:
+        target_mode = "L" if self.subsampling == "gray" else "RGB"
+        if image.mode != target_mode:
+            image = image.convert(target_mode)
+
+        pixels = self._np.asarray(image)
+        if target_mode == "L":
+            pixels = pixels[:, :, None]
+
+        return self._jpeg.encode(
+            pixels,
+            quality=quality,
+            pixel_format=self._pixel_formats[target_mode],
+            jpeg_subsample=self._samp[self.subsampling],
+            flags=self.flags,
+        )
+
+
+class HybridTileEncoder:
+    """Content-aware encoder for text-heavy screens (IDEs, terminals, spreadsheets).
+
+    The frame is split into square tiles and each tile is classified. Tiles
+    with few colours, or a mostly flat background crossed by sharp edges, are
+    "text" and go into a lossless layer (palette PNG when the layer has at
+    most 256 colours, lossless WebP otherwise). All other tiles are "photo" and
+    go into a JPEG layer. Each layer is a single full-frame image in which the
+    other layer's tiles are flattened to one colour, which costs both codecs
+    almost nothing, so a frame carries at most two image headers rather than
+    one per tile.
+
+    ``encode_tiles`` returns the manifest the client composites: draw the
+    ``photo`` layer, then copy every tile marked ``t`` in ``map`` (row-major,
+    ``cols`` x ``rows`` tiles of ``tile_size`` px) from the ``text`` layer on
+    top. A layer without any tiles is left out.
+    """
+    name = "hybrid"
+    mime_type = "application/json"
+
+    def __init__(self, subsampling: str = "4:2:0", tile_size: int = 64,
+                 max_text_colors: int = 256, min_flat_share: float = 0.75,
+                 min_edge_share: float = 0.02):
+        from PIL import features
+
+        self.subsampling = subsampling
+        self.tile_size = tile_size
+        # A tile with at most this many distinct colours is always "text"
+        self.max_text_colors = max_text_colors
+        # Otherwise it is "text" when at least this share of its pixels is
+        # flat background and at least min_edge_share sit on a hard edge
+        self.min_flat_share = min_flat_share
+        self.min_edge_share = min_edge_share
+        self.webp = features.check("webp")
+        # JPEG layer goes through the regular encoder (libjpeg-turbo when available)
+        self._jpeg = get_encoder("auto", subsampling)
+
+    def classify(self, image) -> List[bool]:
+        """One flag per tile (row-major), True for text tiles"""
+        from PIL import ImageFilter
+
+        tile = self.tile_size
+        edges = image.convert("L").filter(ImageFilter.FIND_EDGES)
+        # Per-tile share (0-255) of flat pixels and of hard-edge pixels,
+        # averaged for all tiles at once by a box reduction
+        flat = edges.point(lambda v: 255 if v <= 2 else 0).reduce(tile)
+        sharp = edges.point(lambda v: 255 if v >= 64 else 0).reduce(tile)
+        min_flat = self.min_flat_share * 255
+        min_edge = self.min_edge_share * 255
+
+        width, height = image.size
+        flags = []
+        for row, y in enumerate(range(0, height, tile)):
+            for col, x in enumerate(range(0, width, tile)):
+                if flat.getpixel((col, row)) >= min_flat and sharp.getpixel((col, row)) >= min_edge:
+                    flags.append(True)
+                    continue
+                # Edge tiles are smaller; scale the colour budget to their area
+                box = (x, y, min(x + tile, width), min(y + tile, height))
+                area = (box[2] - x) * (box[3] - y)
+                max_colors = max(16, self.max_text_colors * area // (tile * tile))
+                flags.append(image.crop(box).getcolors(max_colors) is not None)
+        return flags
+
+    def _encode_lossless(self, image) -> tuple:
+        buffer = io.BytesIO()
+        colors = image.getcolors(256)
+        if colors is not None and image.mode == "RGB":
+            # Exact palette (every colour of the layer is an entry), the
+            # smallest and fastest lossless option for UI and text. Max
+            # coverage with one box per distinct colour maps each pixel to
+            # its own colour; quantize(palette=...) would not: its nearest-
+            # colour lookup works at reduced precision and merges colours
+            # that differ in the low bits (off by up to 3 levels)
+            from PIL import Image
+            image = image.quantize(colors=len(colors), method=Image.Quantize.MAXCOVERAGE,
+                                   dither=Image.Dither.NONE)
+        elif colors is None and self.webp:
+            # Anti-aliased text on gradients etc. For lossless WebP quality is
+            # effort: method 0 with full effort is both fast and compact here
+            image.save(buffer, format="WEBP", lossless=True, quality=100, method=0)
+            return "image/webp", buffer.getvalue()
+
+        image.save(buffer, format="PNG", compress_level=6)
+        return "image/png", buffer.getvalue()
+
+    def encode_tiles(self, image, quality: int) -> dict:
+        target_mode = "L" if self.subsampling == "gray" else "RGB"
+        if image.mode != target_mode:
+            image = image.convert(target_mode)
+
+        tile = self.tile_size
+        width, height = image.size
+        cols = -(-width // tile)
+        flags = self.classify(image)
+        boxes = [
+            (x, y, min(x + tile, width), min(y + tile, height))
+            for y in range(0, height, tile) for x in range(0, width, tile)
+        ]
+
+        layers = {}
+        if any(flags):
+            text = image if all(flags) else image.copy()
+            for box, is_text in zip(boxes, flags):
+                if not is_text:
+                    text.paste(0, box)
+            mime, data = self._encode_lossless(text)
+            layers["text"] = f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+        if not all(flags):
+            photo = image if not any(flags) else image.copy()
+            means = image.reduce(tile)
+            for index, (box, is_text) in enumerate(zip(boxes, flags)):
+                if is_text:
+                    # Flat fill in the tile's mean colour keeps block edges soft
+                    photo.paste(means.getpixel((index % cols, index // cols)), box)
+            data = self._jpeg.encode(photo, quality)
+            layers["photo"] = f"data:{self._jpeg.mime_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+        return {
+            "width": width,
+            "height": height,
+            "tile_size": tile,
+            "cols": cols,
+            "rows": -(-height // tile),
+            "map": "".join("t" if is_text else "p" for is_text in flags),
+            "layers": layers,
+        }
+
+    def encode(self, image, quality: int) -> bytes:
+        return json.dumps(self.encode_tiles(image, quality), separators=(",", ":")).encode("utf-8")
+
+
+ENCODERS = {
+    PillowJpegEncoder.name: PillowJpegEncoder,
+    TurboJpegEncoder.name: TurboJpegEncoder,
+    HybridTileEncoder.name: HybridTileEncoder,
+}
+
+# Default for streams that don't ask for a specific encoder
+DEFAULT_ENCODER = os.environ.get("SMARTDESK_JPEG_ENCODER", "auto")
+
+_encoder_cache: Dict[tuple, object] = {}
+
+
+def get_encoder(name: Optional[str] = None, subsampling: str = "4:2:0"):
+    """Return a (cached) encoder by name, falling back to Pillow.
+
+    ``auto`` prefers libjpeg-turbo and silently uses Pillow without it.
+    ``hybrid`` is the tiled text/photo encoder (see HybridTileEncoder).
+    """
+    name = (name or DEFAULT_ENCODER).lower()
+    if subsampling not in SUBSAMPLING_MODES:
+        raise ValueError(f"Unknown chroma subsampling: {subsampling}")
+
+    key = (name, subsampling)
+    if key in _encoder_cache:
+        return _encoder_cache[key]
+
+    if name not in ENCODERS and name != "auto":
+        raise ValueError(f"Unknown encoder: {name}")
+
+    encoder = None
+    if name in ("auto", TurboJpegEncoder.name):
+        try:
+            encoder = TurboJpegEncoder(subsampling=subsampling)
+        except Exception as e:
+            if name == TurboJpegEncoder.name:
+                print(f"⚠️ libjpeg-turbo unavailable, falling back to Pillow: {e}")
+
+    elif name != PillowJpegEncoder.name:
+        encoder = ENCODERS[name](subsampling=subsampling)
+
+    if encoder is None:
+        encoder = PillowJpegEncoder(subsampling=subsampling)
+
+    _encoder_cache[key] = encoder
+    return encoder
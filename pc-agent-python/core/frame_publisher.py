@@ -0,0 +1,187 @@
+# File: core/frame_publisher.py
+"""Single capture process feeding every worker through shared memory.
+
+With several uvicorn workers each one would otherwise grab and encode the
+screen on its own. Instead one producer process captures frames and writes
+the latest encoded frame into a shared memory block; workers read it with a
+seqlock (retry if the sequence changed while copying), so readers never
+block the producer and never see a torn frame.
+"""
+import json
+import multiprocessing
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Optional
+
+# seq (odd while writing), length of the JSON metadata, length of the payload
+# (the data URL, or the JSON tile manifest of the hybrid encoder)
+HEADER = struct.Struct("<QII")
+META_SIZE = 256
+DEFAULT_BUFFER_SIZE = 16 * 1024 * 1024
+
+
+class FrameNotReady(Exception):
+    """The publisher hasn't produced its first frame yet (HTTP 503)"""
+
+
+class SharedFrameBuffer:
+    """Latest-frame slot in a named shared memory block"""
+
+    def __init__(self, name: Optional[str] = None, create: bool = False, size: int = DEFAULT_BUFFER_SIZE):
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        self.capacity = self.shm.size - HEADER.size - META_SIZE
+        if create:
+            HEADER.pack_into(self.shm.buf, 0, 0, 0, 0)
+        else:
+            # Only the creator may unlink; stop this process's resource tracker
+            # from destroying the block when the worker exits
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+
+    def write(self, frame: dict):
+        tiled = "tiles" in frame
+        if tiled:
+            data = json.dumps(frame["tiles"], separators=(",", ":")).encode("ascii")
+        else:
+            data = frame["data_url"].encode("ascii")
+        meta = json.dumps({
+            "etag": frame["etag"],
+            "width": frame["width"],
+            "height": frame["height"],
+            "tiles": tiled,
+            "timestamp": time.time(),
+        }).encode("utf-8")
+        if len(data) > self.capacity or len(meta) > META_SIZE:
+            print(f"⚠️ Frame too large for shared buffer ({len(data)} bytes), skipped")
+            return
+
+        buf = self.shm.buf
+        seq = HEADER.unpack_from(buf, 0)[0]
+        # Odd sequence marks the slot as being written
+        HEADER.pack_into(buf, 0, seq + 1, 0, 0)
+        buf[HEADER.size:HEADER.size + len(meta)] = meta
+        start = HEADER.size + META_SIZE
+        buf[start:start + len(data)] = data
+        HEADER.pack_into(buf, 0, seq + 2, len(meta), len(data))
+
+    @property
+    def published(self) -> bool:
+        return HEADER.unpack_from(self.shm.buf, 0)[0] != 0
+
+    def read(self, retries: int = 50) -> Optional[dict]:
+        buf = self.shm.buf
+        for _ in range(retries):
+            seq, meta_len, data_len = HEADER.unpack_from(buf, 0)
+            if seq == 0:
+                return None  # nothing published yet
+            if seq % 2:
+                time.sleep(0.0005)
+                continue
+
+            meta = bytes(buf[HEADER.size:HEADER.size + meta_len])
+            start = HEADER.size + META_SIZE
+            data = bytes(buf[start:start + data_len])
+
+            if HEADER.unpack_from(buf, 0)[0] == seq:
+                frame = json.loads(meta)
+                if frame.pop("tiles", False):
+                    frame["tiles"] = json.loads(data)
+                else:
+                    frame["data_url"] = data.decode("ascii")
+                frame["seq"] = seq
+                return frame
+        return None
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def run_frame_publisher(shm_name: str, fps: float, stop_event):
+    """Capture loop of the producer process"""
+    from core.screen_capture import ScreenCapture
+
+    screen = ScreenCapture()
+    buffer = SharedFrameBuffer(shm_name)
+    last_etag = None
+    interval = 1.0 / fps
+    print(f"🎥 Frame publisher started ({fps} fps)")
+
+    try:
+        while not stop_event.is_set():
+            started = time.monotonic()
+            frame = screen.capture_frame()
+            # Unchanged screen → leave the slot (and its ETag) alone
+            if frame and frame["etag"] != last_etag:
+                buffer.write(frame)
+                last_etag = frame["etag"]
+            stop_event.wait(max(0.0, interval - (time.monotonic() - started)))
+    finally:
+        buffer.close()
+
+
+class FramePublisher:
+    """Owns the shared buffer and the producer process (used by the launcher)"""
+
+    def __init__(self, fps: float = 10.0, size: int = DEFAULT_BUFFER_SIZE):
+        self.fps = fps
+        self.buffer = SharedFrameBuffer(create=True, size=size)
+        self.name = self.buffer.name
+        self._stop = multiprocessing.Event()
+        self._process = None
+
+    def start(self):
+        self._process = multiprocessing.Process(
+            target=run_frame_publisher,
+            args=(self.name, self.fps, self._stop),
+            name="smartdesk-frame-publisher",
+            daemon=True,
+        )
+        self._process.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._process:
+            self._process.join(timeout=5)
+        self.buffer.close()
+        self.buffer.unlink()
+
+
+class SharedFrameSource:
+    """Stand-in for ScreenCapture inside workers, serving the published frame.
+
+    Frames are encoded once by the publisher for all viewers, so per-stream
+    encoder settings are ignored in this mode.
+    """
+
+    def __init__(self, shm_name: str, first_frame_timeout: float = 2.0):
+        self.buffer = SharedFrameBuffer(shm_name)
+        self.first_frame_timeout = first_frame_timeout
+
+    def capture_frame(self, encoder=None, quality=None, subsampling=None):
+        """Latest published frame; right after startup, waits briefly for the
+        first one and raises FrameNotReady if it still hasn't arrived"""
+        deadline = time.monotonic() + self.first_frame_timeout
+        frame = self.buffer.read()
+        while frame is None and not self.buffer.published:
+            if time.monotonic() >= deadline:
+                raise FrameNotReady("Screen capture is still starting")
+            time.sleep(0.05)
+            frame = self.buffer.read()
+        if frame:
+            frame["changed"] = True
+        return frame
+
+    def capture(self, encoder=None, quality=None, subsampling=None):
+        try:
+            frame = self.capture_frame()
+        except FrameNotReady:
+            return None
+        return frame.get("data_url") if frame else None
@@ -0,0 +1,322 @@
+# File: core/keyboard_injector.py
+"""Text and key-combo injection for the keyboard command.
+
+Whole strings are typed in one call through pynput (native key events, no
+per-key delay, full Unicode) or, without it, pyautogui with its per-call
+pause disabled. Actions that carry a per-session ``seq`` are applied in
+sequence order even when concurrent HTTP requests arrive out of order.
+A seq is only consumed once it has been typed: a seq that was skipped (or
+is out of order on a serial connection) is refused, never acknowledged.
+
+With several worker processes (``--workers N``) consecutive requests of one
+session can land on different workers, so the seq bookkeeping then lives in
+the shared session store instead of this process.
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from core.session_store import shared_session_store
+
+# Default backend: "auto" (pynput, else pyautogui), "pynput" or "pyautogui"
+DEFAULT_BACKEND = os.environ.get("SMARTDESK_KEYBOARD_BACKEND", "auto")
+
+# Shortcut names the app has always sent
+NAMED_SHORTCUTS = {
+    "copy": "ctrl+c",
+    "paste": "ctrl+v",
+    "cut": "ctrl+x",
+    "select all": "ctrl+a",
+    "save": "ctrl+s",
+    "undo": "ctrl+z",
+    "redo": "ctrl+y",
+    "close window": "alt+f4",
+    "task manager": "ctrl+shift+esc",
+    "switch windows": "alt+tab"
+}
+
+# Common spellings → pyautogui key names
+KEY_ALIASES = {
+    "control": "ctrl",
+    "cmd": "win",
+    "command": "win",
+    "super": "win",
+    "meta": "win",
+    "return": "enter",
+    "escape": "esc",
+    "del": "delete",
+    "pgup": "pageup",
+    "pgdn": "pagedown",
+    "page_up": "pageup",
+    "page_down": "pagedown",
+    "spacebar": "space",
+    " ": "space",
+}
+
+
+def parse_combo(combo: str) -> List[str]:
+    """'Ctrl+Shift+T' or a named shortcut ('copy') → ['ctrl', 'shift', 't']"""
+    combo = NAMED_SHORTCUTS.get(combo.strip().lower(), combo)
+    if combo == "+":
+        parts = ["+"]
+    elif combo.endswith("++"):
+        # "ctrl++" is ctrl and the plus key
+        parts = combo[:-2].split("+") + ["+"]
+    else:
+        parts = combo.split("+")
+
+    keys = []
+    for part in parts:
+        key = part.strip().lower() or part  # a lone " " is the space key
+        if not key:
+            raise ValueError(f"Invalid key combination: {combo}")
+        keys.append(KEY_ALIASES.get(key, key))
+    return keys
+
+
+class PynputKeyboard:
+    """Native key events via pynput; types any Unicode text"""
+    name = "pynput"
+
+    def __init__(self):
+        # Raises ImportError when pynput (or a display) is missing
+        from pynput.keyboard import Controller, Key
+        self._keyboard = Controller()
+        self._special = {
+            "win": Key.cmd,
+            "pageup": Key.page_up,
+            "pagedown": Key.page_down,
+            "capslock": Key.caps_lock,
+            "printscreen": Key.print_screen,
+            "numlock": Key.num_lock,
+            "scrolllock": Key.scroll_lock,
+        }
+        self._key_type = Key
+
+    def _key(self, name: str):
+        if len(name) == 1:
+            return name
+        key = self._special.get(name) or getattr(self._key_type, name, None)
+        if key is None:
+            raise ValueError(f"Unknown key: {name}")
+        return key
+
+    def type_text(self, text: str) -> int:
+        self._keyboard.type(text)
+        return 0
+
+    def press_combo(self, keys: List[str]):
+        resolved = [self._key(key) for key in keys]
+        for key in resolved:
+            self._keyboard.press(key)
+        for key in reversed(resolved):
+            self._keyboard.release(key)
+
+
+class PyAutoGuiKeyboard:
+    """pyautogui fallback; limited to keys on the keyboard layout (no Unicode)"""
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._gui = pyautogui
+        self._valid = set(getattr(pyautogui, "KEYBOARD_KEYS", ()))
+
+    def type_text(self, text: str) -> int:
+        """Type ``text``; returns the number of characters it cannot type"""
+        skipped = sum(1 for char in text if not (char.isascii() and (char.isprintable() or char in "\t\n\r")))
+        # _pause=False: pyautogui otherwise sleeps PAUSE (0.1 s) after the call
+        self._gui.write(text, interval=0, _pause=False)
+        return skipped
+
+    def press_combo(self, keys: List[str]):
+        unknown = [key for key in keys if self._valid and key not in self._valid]
+        if unknown:
+            raise ValueError(f"Unknown key: {unknown[0]}")
+        self._gui.hotkey(*keys, _pause=False)
+
+
+BACKENDS = {
+    PynputKeyboard.name: PynputKeyboard,
+    PyAutoGuiKeyboard.name: PyAutoGuiKeyboard,
+}
+
+
+class KeyboardInjector:
+    def __init__(self, backend: Optional[str] = None, reorder_timeout: float = 0.5,
+                 idle_seconds: float = 600.0, store=None):
+        self.backend_name = (backend or DEFAULT_BACKEND).lower()
+        if self.backend_name not in BACKENDS and self.backend_name != "auto":
+            raise ValueError(f"Unknown keyboard backend: {self.backend_name}")
+        self._backend = None
+        # How long an early action waits for the ones before it before the gap is skipped
+        self.reorder_timeout = reorder_timeout
+        self.idle_seconds = idle_seconds
+        # One condition for all sessions: there is only one keyboard, so
+        # injections never interleave mid-word either
+        self._cond = threading.Condition()
+        self._next_seq: Dict[str, int] = {}   # session → next expected seq
+        self._skipped: Dict[str, set] = {}    # session → seqs given up on after a reorder timeout
+        self._last_seen: Dict[str, float] = {}
+        # Seqs shared with the other workers (a SQLite session store), else None
+        self.store = store
+        # How long a worker may hold a claimed seq before others may retry it
+        self.typing_lease = 10.0
+        self.poll_interval = 0.01
+
+    @property
+    def backend(self):
+        """Backend created on first use (it needs a display)"""
+        if self._backend is None:
+            if self.backend_name in ("auto", PynputKeyboard.name):
+                try:
+                    self._backend = PynputKeyboard()
+                except Exception as e:
+                    if self.backend_name == PynputKeyboard.name:
+                        print(f"⚠️ pynput unavailable, falling back to pyautogui: {e}")
+            if self._backend is None:
+                self._backend = PyAutoGuiKeyboard()
+            print(f"⌨️ Keyboard backend: {self._backend.name}")
+        return self._backend
+
+    def _run(self, actions: List[dict]) -> dict:
+        typed = 0
+        skipped = 0
+        combos = 0
+        for action in actions:
+            if action.get("text"):
+                skipped += self.backend.type_text(action["text"])
+                typed += len(action["text"])
+            if action.get("keys"):
+                # One combo ("ctrl+s") or several pressed in turn
+                combo_list = action["keys"]
+                for combo in [combo_list] if isinstance(combo_list, str) else combo_list:
+                    self.backend.press_combo(parse_combo(combo))
+                    combos += 1
+
+        result = {"success": True, "typed": typed, "combos": combos}
+        if skipped:
+            result["skipped"] = skipped
+        return result
+
+    def inject(self, actions: List[dict], session: Optional[str] = None, seq: Optional[int] = None,
+               reorder: bool = True) -> dict:
+        """Type the actions (``{"text": ...}`` / ``{"keys": ...}``) in order.
+
+        With ``session`` and ``seq`` (starting at 1 per session), an action
+        that arrives early waits up to reorder_timeout for the ones before
+        it, and a repeated seq is acknowledged without typing it again. A
+        seq given up on that way is refused if it turns up later.
+
+        ``reorder=False`` is for serial connections (the keyboard WebSocket),
+        where a missing seq cannot arrive while a later one waits: an early
+        seq is refused with the ``expected`` seq instead, so the client
+        resends from there and nothing is skipped.
+        """
+        if session is not None and seq is not None and self.store is not None:
+            return self._inject_shared(actions, session, seq, reorder)
+
+        with self._cond:
+            if session is None or seq is None:
+                return self._run(actions)
+
+            self._prune()
+            self._last_seen[session] = time.monotonic()
+            expected = self._next_seq.get(session, 1)
+            if seq > expected and not reorder:
+                return {
+                    "success": False,
+                    "seq": seq,
+                    "expected": expected,
+                    "error": f"Out of order, resend from seq {expected}"
+                }
+
+            deadline = time.monotonic() + self.reorder_timeout
+            while seq > self._next_seq.get(session, 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    expected = self._next_seq.get(session, 1)
+                    print(f"⚠️ Keyboard input {expected}-{seq - 1} never arrived, skipped")
+                    self._skip(session, range(expected, seq))
+                    break
+                self._cond.wait(remaining)
+
+            if seq in self._skipped.get(session, ()):
+                self._skipped[session].discard(seq)
+                return {
+                    "success": False,
+                    "seq": seq,
+                    "skipped": True,
+                    "error": "Input arrived too late and was skipped to keep typing order"
+                }
+            if seq < self._next_seq.get(session, 1):
+                return {"success": True, "seq": seq, "duplicate": True}
+
+            try:
+                result = self._run(actions)
+            finally:
+                self._next_seq[session] = seq + 1
+                self._cond.notify_all()
+            return dict(result, seq=seq)
+
+    def _inject_shared(self, actions: List[dict], session: str, seq: int, reorder: bool) -> dict:
+        """inject() with the seq state in the shared store (several workers).
+
+        Same outcomes as the in-process path; waiting polls the store since
+        the action that fills a gap may arrive at another worker.
+        """
+        deadline = time.time() + self.reorder_timeout
+        while True:
+            claim = self.store.claim_keyboard_seq(session, seq, time.time(), self.typing_lease,
+                                                  self.idle_seconds)
+            expected = claim["expected"]
+            if claim["state"] == "run":
+                break
+            if claim["state"] == "duplicate":
+                return {"success": True, "seq": seq, "duplicate": True}
+            if claim["state"] == "skipped":
+                return {
+                    "success": False,
+                    "seq": seq,
+                    "skipped": True,
+                    "error": "Input arrived too late and was skipped to keep typing order"
+                }
+            if seq > expected and not reorder:
+                return {
+                    "success": False,
+                    "seq": seq,
+                    "expected": expected,
+                    "error": f"Out of order, resend from seq {expected}"
+                }
+            if seq > expected and time.time() >= deadline \
+                    and self.store.skip_keyboard_seqs(session, expected, seq, time.time()):
+                print(f"⚠️ Keyboard input {expected}-{seq - 1} never arrived, skipped")
+                continue
+            # An earlier seq is missing, or one is being typed by another worker
+            time.sleep(self.poll_interval)
+
+        try:
+            # One keyboard: injections in this process never interleave
+            with self._cond:
+                result = self._run(actions)
+        finally:
+            self.store.finish_keyboard_seq(session, seq, time.time())
+        return dict(result, seq=seq)
+
+    def _skip(self, session: str, seqs: range, limit: int = 1024):
+        skipped = self._skipped.setdefault(session, set())
+        skipped.update(seqs)
+        if len(skipped) > limit:
+            # Keep the most recent gaps; anything older is long past resending
+            for seq in sorted(skipped)[:len(skipped) - limit]:
+                skipped.discard(seq)
+
+    def _prune(self):
+        now = time.monotonic()
+        for session in [s for s, seen in self._last_seen.items() if now - seen > self.idle_seconds]:
+            self._last_seen.pop(session, None)
+            self._next_seq.pop(session, None)
+            self._skipped.pop(session, None)
+
+# Global instance
+keyboard_injector = KeyboardInjector(store=shared_session_store())
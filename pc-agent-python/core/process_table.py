@@ -0,0 +1,143 @@
+# File: core/process_table.py
+import secrets
+import threading
+import time
+import psutil
+from typing import Dict, Optional, Union
+
+# Per-process fields queried once, when the process first appears
+STATIC_ATTRS = ["name", "username", "exe", "create_time"]
+
+
+class ProcessTable:
+    """Cached process list refreshed incrementally, served as versioned diffs.
+
+    Only new PIDs get a full query; known processes are kept as psutil.Process
+    objects so cpu_percent() is measured against the previous refresh without
+    blocking. Each refresh bumps ``version``; clients pass back the version
+    token they hold ("<epoch>:<version>") and receive only rows that changed
+    and PIDs that exited since.
+    """
+
+    def __init__(self, min_refresh_interval: float = 1.0, history_versions: int = 600):
+        self.min_refresh_interval = min_refresh_interval
+        # Diffs are served for this many versions back; older clients get a full list
+        self.history_versions = history_versions
+        # Random per table: a token from another worker process or from before
+        # an agent restart never matches, so it gets a full list, not a wrong diff
+        self.epoch = secrets.token_hex(4)
+        self.version = 0
+
+        self._procs: Dict[int, psutil.Process] = {}
+        self._rows: Dict[int, dict] = {}
+        self._changed_at: Dict[int, int] = {}   # pid → version of last row change
+        self._removed_at: Dict[int, int] = {}   # pid → version it disappeared
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+
+    def _add(self, pid: int):
+        try:
+            proc = psutil.Process(pid)
+            info = proc.as_dict(attrs=STATIC_ATTRS, ad_value=None)
+            proc.cpu_percent(None)  # prime: first call always returns 0.0
+            memory = proc.memory_info().rss
+            status = proc.status()
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            return
+        except psutil.AccessDenied:
+            memory, status = 0, "unknown"
+
+        self._procs[pid] = proc
+        self._rows[pid] = {
+            "pid": pid,
+            "name": info.get("name"),
+            "username": info.get("username"),
+            "exe": info.get("exe"),
+            "create_time": info.get("create_time"),
+            "cpu_percent": 0.0,
+            "memory_mb": round(memory / (1024**2), 1),
+            "status": status,
+        }
+        self._changed_at[pid] = self.version
+        self._removed_at.pop(pid, None)
+
+    def _remove(self, pid: int):
+        self._procs.pop(pid, None)
+        self._rows.pop(pid, None)
+        self._changed_at.pop(pid, None)
+        self._removed_at[pid] = self.version
+
+    def _update(self, pid: int):
+        proc = self._procs[pid]
+        try:
+            with proc.oneshot():
+                if not proc.is_running():  # exited, or PID reused (create_time differs)
+                    raise psutil.NoSuchProcess(pid)
+                cpu = round(proc.cpu_percent(None), 1)
+                memory = round(proc.memory_info().rss / (1024**2), 1)
+                status = proc.status()
+        except psutil.NoSuchProcess:
+            self._remove(pid)
+            if psutil.pid_exists(pid):
+                self._add(pid)
+            return
+        except psutil.AccessDenied:
+            return
+
+        row = self._rows[pid]
+        if (row["cpu_percent"], row["memory_mb"], row["status"]) != (cpu, memory, status):
+            row.update(cpu_percent=cpu, memory_mb=memory, status=status)
+            self._changed_at[pid] = self.version
+
+    def refresh(self, force: bool = False):
+        """Bring the table up to date (at most once per min_refresh_interval)"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_refresh and now - self._last_refresh < self.min_refresh_interval:
+                return
+            self._last_refresh = now
+            self.version += 1
+
+            current = set(psutil.pids())
+            known = set(self._procs)
+            for pid in known - current:
+                self._remove(pid)
+            for pid in known & current:
+                self._update(pid)
+            for pid in current - known:
+                self._add(pid)
+
+            # Forget exits too old to be part of any diff we still serve
+            oldest = self.version - self.history_versions
+            for pid in [pid for pid, version in self._removed_at.items() if version < oldest]:
+                del self._removed_at[pid]
+
+    def _parse_token(self, token: Union[str, int, None]) -> Optional[int]:
+        """Version of this table a token refers to, or None (foreign or malformed)"""
+        epoch, _, version = str(token).partition(":") if token is not None else ("", "", "")
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        return int(version)
+
+    def get_processes(self, since: Union[str, int, None] = None) -> dict:
+        """Full list, or only changes when ``since`` is a version token we can diff from"""
+        self.refresh()
+        with self._lock:
+            since = self._parse_token(since)
+            token = f"{self.epoch}:{self.version}"
+            can_diff = since is not None and self.version - self.history_versions <= since <= self.version
+            if not can_diff:
+                return {
+                    "version": token,
+                    "full": True,
+                    "processes": [dict(row) for row in self._rows.values()],
+                }
+            return {
+                "version": token,
+                "full": False,
+                "changed": [dict(self._rows[pid]) for pid, version in self._changed_at.items() if version > since],
+                "removed": [pid for pid, version in self._removed_at.items() if version > since],
+            }
+
+# Global instance
+process_table = ProcessTable()
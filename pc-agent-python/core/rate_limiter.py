@@ -0,0 +1,91 @@
+# File: core/rate_limiter.py
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+# category → (sustained requests per second, burst size)
+DEFAULT_LIMITS = {
+    "frame": (15.0, 30),       # screen captures (HTTP polls and stream frames)
+    "input": (60.0, 120),      # mouse / keyboard commands
+    "expensive": (0.5, 3),     # system info, process list, disk usage, search
+    "transfer": (5.0, 10),     # file download / upload / checksum requests
+}
+
+
+def _limits_from_env() -> Dict[str, Tuple[float, int]]:
+    """DEFAULT_LIMITS overridden by SMARTDESK_RATE_LIMITS, e.g. "frame=10:20,expensive=1:5"
+
+    Limits are enforced per worker process: with ``--workers N`` a client
+    whose requests are spread over the workers gets up to N times the budget.
+    A malformed value is reported and the defaults are used.
+    """
+    setting = os.environ.get("SMARTDESK_RATE_LIMITS", "")
+    limits = dict(DEFAULT_LIMITS)
+    try:
+        for item in filter(None, setting.split(",")):
+            category, _, value = item.partition("=")
+            rate, _, burst = value.partition(":")
+            if not category.strip() or float(rate) <= 0:
+                raise ValueError(f"bad entry {item!r}")
+            limits[category.strip()] = (float(rate), int(burst or max(1, float(rate))))
+    except ValueError as e:
+        print(f"⚠️ Ignoring SMARTDESK_RATE_LIMITS={setting!r} ({e}), using the default limits")
+        return dict(DEFAULT_LIMITS)
+    return limits
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1.0) -> float:
+        """Spend ``cost`` tokens; returns 0 if allowed, else seconds until it would be"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-client token buckets, one per (client key, category), per process"""
+
+    def __init__(self, limits: Dict[str, Tuple[float, int]] = None, idle_seconds: float = 600.0):
+        self.limits = limits or _limits_from_env()
+        self.idle_seconds = idle_seconds
+        self._buckets: Dict[tuple, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+
+    def check(self, key: str, category: str, cost: float = 1.0) -> float:
+        """0 if the request is admitted, otherwise the retry-after delay in seconds"""
+        if category not in self.limits:
+            return 0.0
+
+        with self._lock:
+            bucket = self._buckets.get((key, category))
+            if bucket is None:
+                bucket = self._buckets[(key, category)] = TokenBucket(*self.limits[category])
+            retry_after = bucket.take(cost)
+            self._prune()
+            return retry_after
+
+    def _prune(self):
+        """Drop buckets of clients that went away (a full bucket holds no state)"""
+        now = time.monotonic()
+        if now - self._last_prune < self.idle_seconds:
+            return
+        self._last_prune = now
+        for key in [key for key, bucket in self._buckets.items() if now - bucket.updated > self.idle_seconds]:
+            del self._buckets[key]
+
+# Global instance
+rate_limiter = RateLimiter()
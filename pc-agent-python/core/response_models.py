@@ -0,0 +1,57 @@
+# File: core/response_models.py
+"""Typed response models for the metric, system-info and listing endpoints.
+
+The preformatted strings ("12.3%", "4.1GB / 16.0GB (25.6%)") stay for
+existing clients; the numeric fields next to them save clients from
+parsing them back.
+"""
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class SystemMetrics(BaseModel):
+    cpu: str
+    ram: str
+    net: str
+    cpu_percent: float
+    ram_percent: float
+    net_kbps: float
+
+
+class SystemInfo(BaseModel):
+    cpu_usage: str
+    memory: str
+    disk: str
+    network_sent: str
+    network_received: str
+    os: str
+    version: str
+    cpu_percent: float
+    memory_used_gb: float
+    memory_total_gb: float
+    memory_percent: float
+    disk_used_gb: float
+    disk_total_gb: float
+    disk_percent: float
+    network_sent_mb: float
+    network_received_mb: float
+
+
+class SystemInfoResponse(BaseModel):
+    success: bool
+    system_info: Optional[SystemInfo] = None
+    error: Optional[str] = None
+
+
+class FileEntry(BaseModel):
+    name: str
+    is_dir: bool
+    size: int
+    modified: float
+
+
+class DirectoryListing(BaseModel):
+    success: bool = True
+    path: str
+    files: List[str]
+    entries: List[FileEntry]
@@ -1,66 +1,133 @@
 # File: core/screen_capture.py
 import base64
-import io
-from PIL import ImageGrab
-import numpy as np
+import hashlib
+from PIL import Image, ImageGrab
+from core.frame_encoder import get_encoder, DEFAULT_ENCODER
+from core.session_recorder import session_recorder
 
 class ScreenCapture:
-    def __init__(self):
+    def __init__(self, grabber=None):
+        # Frame source; defaults to the real desktop (benchmarks inject a synthetic one)
+        self.grabber = grabber or ImageGrab.grab
+
         # Balanced quality and speed (perfect for WiFi/mobile data)
         self.target_width = 1280
         self.target_height = 720
         self.quality = 65  # Perfect clarity + low size
+        self.encoder = DEFAULT_ENCODER  # "auto", "turbo" or "pillow"
+        self.subsampling = "4:2:0"
 
-    def capture(self):
-        try:
-            # Capture full PC screen
-            screenshot = ImageGrab.grab()
+        # Last encoded frame per encoder settings, reused while the screen is unchanged
+        self.fingerprint_reduce = 4
+        self._frame_cache = {}
 
-            # --- Resize to EXACT 1280x720 while preserving aspect ratio ---
-            original_w, original_h = screenshot.size
-            target_w, target_h = self.target_width, self.target_height
+    def _fit_size(self, original_w, original_h):
+        """Target size inside target_width x target_height preserving aspect ratio"""
+        target_w, target_h = self.target_width, self.target_height
 
-            # Compute aspect ratios
-            original_ratio = original_w / original_h
-            target_ratio = target_w / target_h
+        # Compute aspect ratios
+        original_ratio = original_w / original_h
+        target_ratio = target_w / target_h
 
-            if original_ratio > target_ratio:
-                # PC screen is wider → fit width
-                new_w = target_w
-                new_h = int(target_w / original_ratio)
-            else:
-                # PC screen is taller → fit height
-                new_h = target_h
-                new_w = int(target_h * original_ratio)
+        if original_ratio > target_ratio:
+            # PC screen is wider → fit width
+            return target_w, int(target_w / original_ratio)
+        # PC screen is taller → fit height
+        return int(target_h * original_ratio), target_h
+
+    def fingerprint(self, screenshot):
+        """Cheap checksum of a raw frame.
 
-            # Resize using best fast filter
-            screenshot = screenshot.resize((new_w, new_h))
+        Hashes a box-downsampled copy: any visible change shifts the block
+        averages, at a fraction of the cost of hashing every pixel.
+        """
+        small = screenshot.reduce(self.fingerprint_reduce)
+        return hashlib.blake2b(small.tobytes(), digest_size=12).hexdigest()
 
-            # --- Convert to JPEG → Base64 ---
-            buffer = io.BytesIO()
-            screenshot.save(buffer, format="JPEG", quality=self.quality, optimize=True)
-            img_bytes = buffer.getvalue()
-            img_base64 = base64.b64encode(img_bytes).decode("utf-8")
+    def capture_frame(self, encoder=None, quality=None, subsampling=None):
+        """Capture the screen and return the encoded frame with its ETag.
 
-            # Final Data URL
-            data_url = f"data:image/jpeg;base64,{img_base64}"
+        Returns a dict with ``data_url``, ``etag``, ``width``, ``height`` and
+        ``changed`` (False when the frame was served from cache), or None if
+        capture failed. ``encoder``, ``quality`` and ``subsampling`` override
+        the defaults for this call only, so each stream can pick its own
+        trade-off. Unknown encoder or subsampling names raise ValueError.
+        The ``hybrid`` encoder returns its tile manifest under ``tiles``
+        instead of ``data_url`` (see HybridTileEncoder).
+        """
+        codec = get_encoder(encoder or self.encoder, subsampling or self.subsampling)
+        quality = max(30, min(90, int(quality or self.quality)))
+        settings = (codec.name, quality, codec.subsampling)
+
+        try:
+            # Capture full PC screen (cursor excluded - it has its own channel, see CursorTracker)
+            screenshot = self.grabber()
+
+            # Identical screen + identical settings → identical bytes, skip the encode
+            digest = self.fingerprint(screenshot)
+            etag = f'"{digest}-{codec.name}-{quality}-{codec.subsampling}"'
+            cached = self._frame_cache.get(settings)
+            if cached and cached["etag"] == etag:
+                return dict(cached, changed=False)
+
+            # --- Resize to fit 1280x720 while preserving aspect ratio ---
+            original_w, original_h = screenshot.size
+            new_w, new_h = self._fit_size(original_w, original_h)
+
+            if (new_w, new_h) != screenshot.size:
+                # reducing_gap first does a cheap integer box reduction, so the
+                # bilinear pass only touches ~2x the output pixels
+                screenshot = screenshot.resize((new_w, new_h), Image.BILINEAR, reducing_gap=2.0)
+
+            # No-op unless a recording is running (queued, encoded off this thread)
+            session_recorder.record_frame(screenshot, digest)
+
+            frame = {"etag": etag, "width": new_w, "height": new_h}
+            if hasattr(codec, "encode_tiles"):
+                # Text/photo layers composited by the client
+                frame["tiles"] = codec.encode_tiles(screenshot, quality)
+                payload_size = sum(len(layer) for layer in frame["tiles"]["layers"].values())
+            else:
+                # --- Convert to JPEG → Base64 ---
+                img_bytes = codec.encode(screenshot, quality)
+                img_base64 = base64.b64encode(img_bytes).decode("utf-8")
+                frame["data_url"] = f"data:{codec.mime_type};base64,{img_base64}"
+                payload_size = len(img_base64)
+            self._frame_cache[settings] = frame
 
             # Debug logs
             print("✅ Screen captured")
             print(f"   Original screen: {original_w}x{original_h}")
             print(f"   Sent as: {new_w}x{new_h}")
-            print(f"   JPEG Quality: {self.quality}")
-            print(f"   Base64 Size: {len(img_base64)} chars")
+            print(f"   JPEG Quality: {quality} ({codec.name}, {codec.subsampling})")
+            print(f"   Base64 Size: {payload_size} chars")
 
-            return data_url
+            return dict(frame, changed=True)
 
         except Exception as e:
             print(f"❌ Screen capture error: {e}")
             return None
 
+    def capture(self, encoder=None, quality=None, subsampling=None):
+        """Capture the screen as a JPEG data URL (see capture_frame).
+
+        The tiled ``hybrid`` encoder has no single data URL, so callers of
+        this method (the /debug/screen-* endpoints) get a plain JPEG then.
+        """
+        if hasattr(get_encoder(encoder or self.encoder, subsampling or self.subsampling), "encode_tiles"):
+            encoder = "auto"
+        frame = self.capture_frame(encoder, quality, subsampling)
+        return frame.get("data_url") if frame else None
+
     # Not used now, but kept for future settings screen
     def set_quality(self, quality):
         self.quality = max(30, min(90, quality))
 
+    def set_encoder(self, encoder, subsampling=None):
+        get_encoder(encoder, subsampling or self.subsampling)  # validate early
+        self.encoder = encoder
+        if subsampling:
+            self.subsampling = subsampling
+
     def set_scale(self, scale):
         pass  # Disabled (now using fixed HD resolution)
@@ -0,0 +1,111 @@
+# File: core/services.py
+"""Lazily constructed agent subsystems.
+
+Subsystems (screen capture, input, connections, ...) pull in heavy or
+display-dependent modules such as pyautogui, PIL and qrcode. They are
+registered here as factories and only built on first use, so the agent starts
+fast and still starts on a headless box. Import and construction costs are
+recorded for the startup report (/debug/startup).
+"""
+import importlib
+import sys
+import threading
+import time
+from typing import Callable, Dict
+
+# Reference point for the startup report
+PROCESS_STARTED = time.perf_counter()
+
+
+class ServiceRegistry:
+    def __init__(self):
+        self._factories: Dict[str, Callable] = {}
+        self._instances: Dict[str, object] = {}
+        self._lock = threading.RLock()  # factories may depend on other services
+        self.import_times: Dict[str, float] = {}
+        self.service_times: Dict[str, dict] = {}
+        self.ready_at = None
+
+    def register(self, name: str, factory: Callable):
+        """Register a zero-argument factory building the service"""
+        self._factories[name] = factory
+
+    def get(self, name: str):
+        """Return the service, building it on first use"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            if name not in self._factories:
+                raise KeyError(f"Unknown service: {name}")
+
+            started = time.perf_counter()
+            instance = self._factories[name]()
+            self.service_times[name] = {
+                "init_ms": round((time.perf_counter() - started) * 1000, 2),
+                "first_use_s": round(started - PROCESS_STARTED, 3),
+            }
+            self._instances[name] = instance
+            print(f"⚙️ Loaded {name} in {self.service_times[name]['init_ms']} ms")
+            return instance
+
+    def lazy(self, name: str) -> "LazyService":
+        """Proxy that builds the service when an attribute is first touched"""
+        return LazyService(self, name)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def load(self, module_name: str):
+        """Import a module, recording how long it took if it wasn't loaded yet"""
+        if module_name in sys.modules:
+            return sys.modules[module_name]
+
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        self.import_times[module_name] = round((time.perf_counter() - started) * 1000, 2)
+        return module
+
+    def record_import(self, label: str, started: float):
+        """Record an eager import block that began at ``started`` (perf_counter)"""
+        self.import_times[label] = round((time.perf_counter() - started) * 1000, 2)
+
+    def mark_ready(self):
+        self.ready_at = time.perf_counter()
+
+    def report(self) -> dict:
+        """Startup-time report: import costs per module and service init costs"""
+        return {
+            "startup_ms": round((self.ready_at - PROCESS_STARTED) * 1000, 2) if self.ready_at else None,
+            "imports_ms": dict(sorted(self.import_times.items(), key=lambda item: -item[1])),
+            "services": {
+                name: dict(self.service_times.get(name, {}), loaded=name in self._instances)
+                for name in self._factories
+            },
+        }
+
+
+class LazyService:
+    """Attribute-forwarding stand-in for a registered service"""
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: ServiceRegistry, name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self._registry.is_loaded(self._name) else "not loaded"
+        return f"<LazyService {self._name} ({state})>"
+
+
+# Global instance
+services = ServiceRegistry()
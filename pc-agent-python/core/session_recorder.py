@@ -0,0 +1,373 @@
+# File: core/session_recorder.py
+"""Opt-in recording of remote sessions for later review.
+
+``ScreenCapture`` and ``CommandExecutor`` hand frames and commands to the
+recorder, which only timestamps them and puts them on a bounded queue; a
+background thread does the diffing, compression and disk writes. When the
+queue is full the item is dropped (and counted) rather than slowing down
+the live stream.
+
+A recording is two append-only files:
+
+``<name>.sdrec``  records: RECORD header + compressed payload. Keyframes hold
+                  the whole frame's raw pixels, deltas only the tiles that
+                  changed since the previous frame, events the command JSON.
+``<name>.sdidx``  one fixed-size INDEX entry per record (timestamp, offset,
+                  index of the keyframe to decode from). Readers mmap it and
+                  bisect on the timestamps, so seeking is O(log n).
+"""
+import bisect
+import gzip
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+# timestamp, kind, codec, payload length
+RECORD = struct.Struct("<dBBxxI")
+# timestamp, record offset, keyframe entry number, kind
+INDEX = struct.Struct("<dQIB3x")
+# keyframe: width, height, mode ("RGB" / "L" padded); delta: + tile size, tile count
+FRAME_HEADER = struct.Struct("<HH4s")
+DELTA_HEADER = struct.Struct("<HH4sHI")
+TILE = struct.Struct("<HHHH")
+
+KIND_KEYFRAME = 0
+KIND_DELTA = 1
+KIND_EVENT = 2
+
+CODEC_NONE = 0
+CODEC_GZIP = 1
+CODEC_ZSTD = 2
+
+
+def _zstd():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def compress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        return _zstd().ZstdCompressor(level=3).compress(data)
+    if codec == CODEC_GZIP:
+        return gzip.compress(data, compresslevel=1, mtime=0)
+    return data
+
+
+def decompress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        zstd = _zstd()
+        if zstd is None:
+            raise RuntimeError("Recording is zstd-compressed; install zstandard to read it")
+        return zstd.ZstdDecompressor().decompress(data)
+    if codec == CODEC_GZIP:
+        return gzip.decompress(data)
+    return data
+
+
+class SessionRecorder:
+    def __init__(self, directory: Optional[str] = None, max_fps: float = 5.0,
+                 keyframe_interval: float = 10.0, queue_size: int = 16, tile_size: int = 64):
+        self.directory = directory or os.environ.get("SMARTDESK_RECORD_DIR") or os.path.join(
+            os.path.expanduser("~"), ".smartdesk", "recordings")
+        # Frames beyond this rate are skipped (the live stream is unaffected)
+        self.max_fps = max_fps
+        # A full frame at least this often, so seeking never decodes long delta chains
+        self.keyframe_interval = keyframe_interval
+        self.tile_size = tile_size
+        self.codec = CODEC_ZSTD if _zstd() else CODEC_GZIP
+
+        self.active = False
+        self.name = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._last_offer = 0.0
+        self._last_digest = None
+        self.stats = {}
+
+    # ---------------- hot path ----------------
+    def _offer(self, item: tuple):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def record_frame(self, image, digest: Optional[str] = None):
+        """Queue a frame as sent to viewers (cheap no-op while not recording)"""
+        if not self.active:
+            return
+        now = time.time()
+        if digest is not None and digest == self._last_digest:
+            return  # same screen, other encoder settings
+        if now - self._last_offer < 1.0 / self.max_fps:
+            return
+        self._last_offer = now
+        self._last_digest = digest
+        self._offer((now, "frame", image))
+
+    def record_event(self, command_type: str, command_data, session: Optional[str] = None):
+        """Queue an executed command"""
+        if not self.active:
+            return
+        self._offer((time.time(), "event", {"type": command_type, "data": command_data, "session": session}))
+
+    # ---------------- control ----------------
+    def start(self, name: Optional[str] = None) -> dict:
+        with self._lock:
+            if self.active:
+                return {"success": False, "error": f"Already recording: {self.name}"}
+
+            os.makedirs(self.directory, exist_ok=True)
+            name = name or datetime.now().strftime("session-%Y%m%d-%H%M%S")
+            base = os.path.join(self.directory, os.path.basename(name))
+            if os.path.exists(base + ".sdrec"):
+                return {"success": False, "error": f"Recording already exists: {name}"}
+            self.name = name
+
+            self.stats = {"frames": 0, "keyframes": 0, "events": 0, "dropped": 0, "bytes": 0, "error": None}
+            # Late offers that raced the previous stop()
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._last_offer = 0.0
+            self._last_digest = None
+            self._thread = threading.Thread(
+                target=self._writer, args=(base,), name="session-recorder", daemon=True)
+            self.active = True
+            self._thread.start()
+
+        print(f"⏺️ Recording session to {base}.sdrec")
+        return {"success": True, "name": self.name, "path": base + ".sdrec"}
+
+    def stop(self) -> dict:
+        with self._lock:
+            if not self.active:
+                return {"success": False, "error": "Not recording"}
+            self.active = False
+            self._queue.put(None)  # writer drains what's queued, then exits
+            self._thread.join()
+            self._thread = None
+
+        print(f"⏹️ Recording stopped: {self.name}")
+        return dict(self.status(), success=True)
+
+    def status(self) -> dict:
+        return {"recording": self.active, "name": self.name, "directory": self.directory, **self.stats}
+
+    def list_recordings(self) -> List[dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        recordings = []
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith(".sdrec"):
+                path = os.path.join(self.directory, filename)
+                recordings.append({
+                    "name": filename[:-len(".sdrec")],
+                    "size": os.path.getsize(path),
+                    "modified": os.path.getmtime(path),
+                })
+        return recordings
+
+    # ---------------- writer thread ----------------
+    def _changed_tiles(self, previous, image) -> list:
+        from PIL import ImageChops
+
+        diff = ImageChops.difference(previous, image)
+        width, height = image.size
+        tile = self.tile_size
+        changed = []
+        for y in range(0, height, tile):
+            for x in range(0, width, tile):
+                box = (x, y, min(x + tile, width), min(y + tile, height))
+                if diff.crop(box).getbbox():
+                    changed.append(box)
+        return changed
+
+    def _encode_frame(self, image, previous, last_keyframe_at: float, timestamp: float) -> tuple:
+        """(kind, raw payload) for a frame, or (None, None) if nothing changed"""
+        mode = image.mode.encode("ascii").ljust(4)
+        keyframe = (
+            previous is None
+            or previous.size != image.size
+            or previous.mode != image.mode
+            or timestamp - last_keyframe_at >= self.keyframe_interval
+        )
+        if not keyframe:
+            changed = self._changed_tiles(previous, image)
+            if not changed:
+                return None, None
+            tiles_total = -(-image.size[0] // self.tile_size) * -(-image.size[1] // self.tile_size)
+            # Mostly-new screen: a keyframe is as big and resets the chain
+            keyframe = len(changed) > tiles_total * 0.6
+
+        if keyframe:
+            return KIND_KEYFRAME, FRAME_HEADER.pack(*image.size, mode) + image.tobytes()
+
+        parts = [DELTA_HEADER.pack(*image.size, mode, self.tile_size, len(changed))]
+        parts.extend(TILE.pack(*box) for box in changed)
+        parts.extend(image.crop(box).tobytes() for box in changed)
+        return KIND_DELTA, b"".join(parts)
+
+    def _writer(self, base: str):
+        try:
+            self._write_loop(base)
+        except Exception as e:
+            # Disk full, file removed, ...: stop recording instead of
+            # reporting an active recording that no longer writes anything
+            print(f"❌ Recording {self.name} stopped by an error: {e}")
+            self.stats["error"] = str(e)
+            self.active = False
+            # Nothing reads the queue any more; keep stop()/start() from blocking on it
+            while not self._queue.empty():
+                self._queue.get_nowait()
+
+    def _write_loop(self, base: str):
+        previous = None
+        last_keyframe_at = 0.0
+        keyframe_entry = 0
+        entries = 0
+        last_flush = time.monotonic()
+
+        with open(base + ".sdrec", "ab") as log, open(base + ".sdidx", "ab") as index:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+
+                timestamp, item_type, value = item
+                try:
+                    if item_type == "frame":
+                        if value.mode not in ("RGB", "L"):
+                            value = value.convert("RGB")
+                        kind, payload = self._encode_frame(value, previous, last_keyframe_at, timestamp)
+                        if kind is None:
+                            continue
+                        previous = value
+                    else:
+                        kind, payload = KIND_EVENT, json.dumps(value, default=str).encode("utf-8")
+                except Exception as e:
+                    print(f"⚠️ Recorder skipped an item: {e}")
+                    continue
+
+                data = compress(payload, self.codec)
+                offset = log.tell()
+                log.write(RECORD.pack(timestamp, kind, self.codec, len(data)))
+                log.write(data)
+
+                if kind == KIND_KEYFRAME:
+                    keyframe_entry = entries
+                    last_keyframe_at = timestamp
+                    self.stats["keyframes"] += 1
+                self.stats["frames" if kind != KIND_EVENT else "events"] += 1
+                self.stats["bytes"] = offset + RECORD.size + len(data)
+                index.write(INDEX.pack(timestamp, offset, keyframe_entry, kind))
+                entries += 1
+
+                # Log before index, so an index entry never points past the log
+                if time.monotonic() - last_flush > 1.0:
+                    log.flush()
+                    index.flush()
+                    last_flush = time.monotonic()
+
+
+class _Timestamps:
+    """Sequence view of the index timestamps for bisect"""
+
+    def __init__(self, index: mmap.mmap, count: int):
+        self.index = index
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return INDEX.unpack_from(self.index, i * INDEX.size)[0]
+
+
+class RecordingReader:
+    """Random access to a recording through its memory-mapped index"""
+
+    def __init__(self, path: str):
+        base = path[:-len(".sdrec")] if path.endswith(".sdrec") else path
+        self._log = open(base + ".sdrec", "rb")
+        self._index_file = open(base + ".sdidx", "rb")
+        size = os.fstat(self._index_file.fileno()).st_size
+        # Ignore a torn trailing entry of a recording still being written
+        self.count = size // INDEX.size
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+        self._timestamps = _Timestamps(self._index, self.count)
+
+    def close(self):
+        if self.count:
+            self._index.close()
+        self._index_file.close()
+        self._log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def entry(self, i: int) -> dict:
+        timestamp, offset, keyframe, kind = INDEX.unpack_from(self._index, i * INDEX.size)
+        return {"timestamp": timestamp, "offset": offset, "keyframe": keyframe, "kind": kind}
+
+    def seek(self, timestamp: float) -> int:
+        """Entry number of the last record at or before ``timestamp`` (-1 if none)"""
+        return bisect.bisect_right(self._timestamps, timestamp) - 1
+
+    def payload(self, i: int) -> bytes:
+        offset = self.entry(i)["offset"]
+        self._log.seek(offset)
+        _, _, codec, length = RECORD.unpack(self._log.read(RECORD.size))
+        return decompress(self._log.read(length), codec)
+
+    def frame_at(self, timestamp: float):
+        """Screen as it was at ``timestamp`` (PIL image), or None before the first frame"""
+        from PIL import Image
+
+        i = self.seek(timestamp)
+        if i < 0:
+            return None
+
+        image = None
+        for j in range(self.entry(i)["keyframe"], i + 1):
+            kind = self.entry(j)["kind"]
+            if kind == KIND_EVENT:
+                continue
+            data = self.payload(j)
+            if kind == KIND_KEYFRAME:
+                width, height, mode = FRAME_HEADER.unpack_from(data)
+                image = Image.frombytes(mode.decode("ascii").strip(), (width, height), data[FRAME_HEADER.size:])
+            elif image is not None:
+                width, height, mode, tile, count = DELTA_HEADER.unpack_from(data)
+                mode = mode.decode("ascii").strip()
+                pos = DELTA_HEADER.size + count * TILE.size
+                for t in range(count):
+                    box = TILE.unpack_from(data, DELTA_HEADER.size + t * TILE.size)
+                    size = (box[2] - box[0], box[3] - box[1])
+                    length = size[0] * size[1] * len(mode)
+                    image.paste(Image.frombytes(mode, size, data[pos:pos + length]), box[:2])
+                    pos += length
+        return image
+
+    def events(self, start: float = 0.0, end: float = float("inf")) -> Iterator[dict]:
+        """Commands recorded between ``start`` and ``end``"""
+        for i in range(bisect.bisect_left(self._timestamps, start), self.count):
+            entry = self.entry(i)
+            if entry["timestamp"] > end:
+                break
+            if entry["kind"] == KIND_EVENT:
+                yield dict(json.loads(self.payload(i)), timestamp=entry["timestamp"])
+
+# Global instance
+session_recorder = SessionRecorder()
@@ -0,0 +1,155 @@
+# File: core/session_stats.py
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional
+from core.session_store import shared_session_store
+
+
+class _Counters:
+    __slots__ = ("requests", "frames", "bytes_out", "input_events", "latencies", "last_seen")
+
+    def __init__(self, window: int):
+        self.requests = 0
+        self.frames = 0
+        self.bytes_out = 0
+        self.input_events = 0
+        self.latencies = deque(maxlen=window)  # seconds, most recent requests only
+        self.last_seen = 0.0
+
+
+class SessionStats:
+    """Per-device traffic counters, keyed by connection code.
+
+    Updates are a dict lookup and a few increments, cheap enough for every
+    request. Latency percentiles are computed over the most recent
+    ``window`` requests, and only when read.
+
+    With several worker processes each one counts its own traffic and
+    flush() copies it to the shared session store every flush_seconds;
+    snapshot() adds up every worker's counters from there.
+    """
+
+    def __init__(self, window: int = 256, store=None):
+        self.window = window
+        self._sessions: Dict[str, _Counters] = {}
+        self._dirty = set()  # devices with traffic since the last flush
+        self._lock = threading.Lock()
+        # Without a store, the shared one is looked up on first use (never on the event loop)
+        self._store = store
+        self._store_resolved = store is not None
+        self.worker = str(os.getpid())
+        self.flush_seconds = 2.0
+
+    @property
+    def store(self):
+        """The shared session store in multi-worker mode, else None"""
+        if not self._store_resolved:
+            self._store = shared_session_store()
+            self._store_resolved = True
+        return self._store
+
+    def _counters(self, code: str) -> _Counters:
+        self._dirty.add(code)
+        counters = self._sessions.get(code)
+        if counters is None:
+            counters = self._sessions.setdefault(code, _Counters(self.window))
+        return counters
+
+    def record_request(self, code: str, latency: float, bytes_out: int):
+        """One finished HTTP request (called by the stats middleware)"""
+        with self._lock:
+            counters = self._counters(code)
+            counters.requests += 1
+            counters.bytes_out += bytes_out
+            counters.latencies.append(latency)
+            counters.last_seen = time.time()
+
+    def record_frame(self, code: str, bytes_out: int = 0):
+        """A screen frame delivered; ``bytes_out`` only for pushed (WebSocket) frames"""
+        with self._lock:
+            counters = self._counters(code)
+            counters.frames += 1
+            counters.bytes_out += bytes_out
+            counters.last_seen = time.time()
+
+    def record_sent(self, code: str, bytes_out: int):
+        """Other pushed WebSocket traffic"""
+        with self._lock:
+            counters = self._counters(code)
+            counters.bytes_out += bytes_out
+            counters.last_seen = time.time()
+
+    def record_input(self, code: str, events: int = 1):
+        with self._lock:
+            counters = self._counters(code)
+            counters.input_events += events
+            counters.last_seen = time.time()
+
+    def _row(self, code: str) -> Optional[dict]:
+        counters = self._sessions.get(code)
+        if counters is None:
+            return None
+        return {
+            "code": code,
+            "requests": counters.requests,
+            "frames_sent": counters.frames,
+            "bytes_out": counters.bytes_out,
+            "input_events": counters.input_events,
+            "latencies": list(counters.latencies),
+            "last_seen": counters.last_seen,
+        }
+
+    def flush(self):
+        """Publish this worker's counters to the shared store (blocking; no-op with one worker)"""
+        if self.store is None:
+            return
+        with self._lock:
+            rows = [row for row in map(self._row, self._dirty) if row is not None]
+            self._dirty.clear()
+        if rows:
+            self.store.save_session_stats(self.worker, rows)
+
+    def snapshot(self, code: str) -> Optional[dict]:
+        """Counters for one device, or None if it hasn't made a request yet.
+
+        Blocking in multi-worker mode, where the other workers' counters are
+        read from the shared store (as of their last flush).
+        """
+        with self._lock:
+            local = self._row(code)
+        rows = [local] if local else []
+        if self.store is not None:
+            rows += [row for row in self.store.load_session_stats(code) if row["worker"] != self.worker]
+        if not rows:
+            return None
+
+        latencies = sorted(latency for row in rows for latency in row["latencies"])
+        result = {
+            key: sum(row[key] for row in rows)
+            for key in ("requests", "frames_sent", "bytes_out", "input_events")
+        }
+        result["last_seen"] = max(row["last_seen"] for row in rows)
+
+        def percentile(pct):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(pct / 100 * len(latencies)))] * 1000, 2)
+
+        result["latency_p50_ms"] = percentile(50)
+        result["latency_p99_ms"] = percentile(99)
+        return result
+
+    def retain(self, codes: Iterable[str]):
+        """Forget devices that are no longer connected"""
+        keep = set(codes)
+        with self._lock:
+            for code in [code for code in self._sessions if code not in keep]:
+                del self._sessions[code]
+            self._dirty &= keep
+        if self.store is not None:
+            self.store.retain_session_stats(keep)
+
+# Global instance
+session_stats = SessionStats()
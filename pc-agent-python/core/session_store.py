@@ -0,0 +1,417 @@
+# File: core/session_store.py
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
+class MemorySessionStore:
+    """Connection state kept in this process (single-worker default)"""
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.codes: Dict[str, dict] = {}
+        self.requests: List[dict] = []
+        self.connections: List[dict] = []
+        self._connected_codes = set()
+        self.revocations: Dict[str, float] = {}
+
+    # ---- connection codes ----
+    def add_code(self, code: str, created_at: float):
+        with self._lock:
+            self.codes[code] = {
+                'created_at': created_at,
+                'used': False,
+                'connected_device': None
+            }
+
+    def get_code(self, code: str) -> Optional[dict]:
+        return self.codes.get(code)
+
+    def delete_code(self, code: str):
+        with self._lock:
+            self.codes.pop(code, None)
+
+    def delete_codes_created_before(self, cutoff: float) -> List[str]:
+        with self._lock:
+            expired = [code for code, data in self.codes.items() if data['created_at'] < cutoff]
+            for code in expired:
+                del self.codes[code]
+            return expired
+
+    def mark_code_used(self, code: str, device_info: str):
+        with self._lock:
+            if code in self.codes:
+                self.codes[code]['used'] = True
+                self.codes[code]['connected_device'] = device_info
+
+    # ---- connection requests ----
+    def add_request(self, code: str, device_info: str, timestamp: float) -> int:
+        with self._lock:
+            request_id = len(self.requests)
+            self.requests.append({
+                'id': request_id,
+                'code': code,
+                'device_info': device_info,
+                'timestamp': timestamp,
+                'status': 'pending'  # pending, accepted, rejected
+            })
+            return request_id
+
+    def get_request(self, request_id: int) -> Optional[dict]:
+        # Ids are list positions
+        if isinstance(request_id, int) and 0 <= request_id < len(self.requests):
+            return self.requests[request_id]
+        return None
+
+    def list_requests(self, status: Optional[str] = None) -> List[dict]:
+        return [req for req in self.requests if status is None or req['status'] == status]
+
+    def set_request_status(self, request_id: int, status: str):
+        req = self.get_request(request_id)
+        if req:
+            req['status'] = status
+
+    # ---- active connections ----
+    def add_connection(self, connection: dict):
+        with self._lock:
+            self.connections.append(connection)
+            self._connected_codes.add(connection['code'])
+
+    def has_connection(self, code: str) -> bool:
+        return code in self._connected_codes
+
+    def list_connections(self) -> List[dict]:
+        return self.connections
+
+    def remove_connections(self, code: str) -> List[dict]:
+        with self._lock:
+            removed = [conn for conn in self.connections if conn['code'] == code]
+            self.connections = [conn for conn in self.connections if conn['code'] != code]
+            self._connected_codes.discard(code)
+            return removed
+
+    # ---- revoked session tokens ----
+    def add_revocation(self, session_id: str, expires_at: float, now: float):
+        with self._lock:
+            # Expired tokens fail verification anyway; prune them on the write path
+            self.revocations = {sid: exp for sid, exp in self.revocations.items() if exp >= now}
+            self.revocations[session_id] = expires_at
+
+    def list_revocations(self, now: float) -> Dict[str, float]:
+        with self._lock:
+            return {sid: exp for sid, exp in self.revocations.items() if exp >= now}
+
+
+class SQLiteSessionStore:
+    """Connection state in a SQLite file shared by every worker process"""
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._db() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS codes (
+                    code TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    used INTEGER NOT NULL DEFAULT 0,
+                    connected_device TEXT
+                );
+                CREATE TABLE IF NOT EXISTS requests (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    code TEXT NOT NULL,
+                    device_info TEXT,
+                    timestamp REAL NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending'
+                );
+                CREATE INDEX IF NOT EXISTS requests_status ON requests (status);
+                CREATE TABLE IF NOT EXISTS connections (
+                    code TEXT NOT NULL,
+                    device_info TEXT,
+                    connected_at REAL NOT NULL,
+                    session_id TEXT,
+                    token TEXT
+                );
+                CREATE INDEX IF NOT EXISTS connections_code ON connections (code);
+                CREATE TABLE IF NOT EXISTS revocations (
+                    session_id TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS keyboard_seqs (
+                    session TEXT PRIMARY KEY,
+                    next_seq INTEGER NOT NULL,
+                    typing_until REAL NOT NULL DEFAULT 0,
+                    last_seen REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS keyboard_skipped (
+                    session TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    PRIMARY KEY (session, seq)
+                );
+                CREATE TABLE IF NOT EXISTS session_stats (
+                    worker TEXT NOT NULL,
+                    code TEXT NOT NULL,
+                    requests INTEGER NOT NULL,
+                    frames_sent INTEGER NOT NULL,
+                    bytes_out INTEGER NOT NULL,
+                    input_events INTEGER NOT NULL,
+                    latencies TEXT NOT NULL,
+                    last_seen REAL NOT NULL,
+                    PRIMARY KEY (worker, code)
+                );
+            """)
+            # Databases created before session tokens existed
+            for column in ("session_id", "token"):
+                try:
+                    db.execute(f"ALTER TABLE connections ADD COLUMN {column} TEXT")
+                except sqlite3.OperationalError:
+                    pass  # already there
+
+    def _db(self) -> sqlite3.Connection:
+        """One connection per thread (FastAPI runs sync handlers in a pool)"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    # ---- connection codes ----
+    def add_code(self, code: str, created_at: float):
+        self._db().execute(
+            "INSERT OR REPLACE INTO codes (code, created_at, used, connected_device) VALUES (?, ?, 0, NULL)",
+            (code, created_at)
+        )
+
+    def get_code(self, code: str) -> Optional[dict]:
+        row = self._db().execute(
+            "SELECT created_at, used, connected_device FROM codes WHERE code = ?", (code,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'created_at': row['created_at'],
+            'used': bool(row['used']),
+            'connected_device': row['connected_device']
+        }
+
+    def delete_code(self, code: str):
+        self._db().execute("DELETE FROM codes WHERE code = ?", (code,))
+
+    def delete_codes_created_before(self, cutoff: float) -> List[str]:
+        db = self._db()
+        expired = [row['code'] for row in db.execute(
+            "SELECT code FROM codes WHERE created_at < ?", (cutoff,)
+        )]
+        if expired:
+            db.execute("DELETE FROM codes WHERE created_at < ?", (cutoff,))
+        return expired
+
+    def mark_code_used(self, code: str, device_info: str):
+        self._db().execute(
+            "UPDATE codes SET used = 1, connected_device = ? WHERE code = ?", (device_info, code)
+        )
+
+    # ---- connection requests ----
+    def add_request(self, code: str, device_info: str, timestamp: float) -> int:
+        cursor = self._db().execute(
+            "INSERT INTO requests (code, device_info, timestamp) VALUES (?, ?, ?)",
+            (code, device_info, timestamp)
+        )
+        return cursor.lastrowid
+
+    def get_request(self, request_id: int) -> Optional[dict]:
+        row = self._db().execute("SELECT * FROM requests WHERE id = ?", (request_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_requests(self, status: Optional[str] = None) -> List[dict]:
+        if status is None:
+            rows = self._db().execute("SELECT * FROM requests ORDER BY id")
+        else:
+            rows = self._db().execute("SELECT * FROM requests WHERE status = ? ORDER BY id", (status,))
+        return [dict(row) for row in rows]
+
+    def set_request_status(self, request_id: int, status: str):
+        self._db().execute("UPDATE requests SET status = ? WHERE id = ?", (status, request_id))
+
+    # ---- active connections ----
+    def add_connection(self, connection: dict):
+        self._db().execute(
+            "INSERT INTO connections (code, device_info, connected_at, session_id, token) VALUES (?, ?, ?, ?, ?)",
+            (connection['code'], connection['device_info'], connection['connected_at'],
+             connection.get('session_id'), connection.get('token'))
+        )
+
+    def has_connection(self, code: str) -> bool:
+        row = self._db().execute("SELECT 1 FROM connections WHERE code = ? LIMIT 1", (code,)).fetchone()
+        return row is not None
+
+    def list_connections(self) -> List[dict]:
+        rows = self._db().execute(
+            "SELECT device_info, connected_at, code, session_id, token FROM connections ORDER BY rowid"
+        )
+        return [dict(row) for row in rows]
+
+    def remove_connections(self, code: str) -> List[dict]:
+        db = self._db()
+        removed = [dict(row) for row in db.execute(
+            "SELECT device_info, connected_at, code, session_id, token FROM connections WHERE code = ?", (code,)
+        )]
+        db.execute("DELETE FROM connections WHERE code = ?", (code,))
+        return removed
+
+    # ---- revoked session tokens ----
+    def add_revocation(self, session_id: str, expires_at: float, now: float):
+        db = self._db()
+        # Expired tokens fail verification anyway; pruned here, on the rare
+        # write, so the periodic list_revocations() stays a read-only query
+        db.execute("DELETE FROM revocations WHERE expires_at < ?", (now,))
+        db.execute(
+            "INSERT OR REPLACE INTO revocations (session_id, expires_at) VALUES (?, ?)", (session_id, expires_at)
+        )
+
+    def list_revocations(self, now: float) -> Dict[str, float]:
+        rows = self._db().execute("SELECT session_id, expires_at FROM revocations WHERE expires_at >= ?", (now,))
+        return {row['session_id']: row['expires_at'] for row in rows}
+
+    # ---- keyboard sequence numbers (KeyboardInjector with several workers) ----
+    def _transaction(self, work):
+        """Run ``work(db)`` under a write lock so workers see each other's seqs atomically"""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(db)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return result
+
+    def claim_keyboard_seq(self, session: str, seq: int, now: float, lease: float,
+                           idle_seconds: float = 600.0) -> dict:
+        """Decide what a worker does with keyboard input ``seq`` of ``session``.
+
+        Returns {"state": ..., "expected": next seq}, state being "run" (the
+        caller now holds seq for ``lease`` seconds and must finish_keyboard_seq
+        it), "duplicate", "skipped" or "wait" (an earlier seq is missing, or
+        this one is being typed by another worker).
+        """
+        def claim(db):
+            row = db.execute(
+                "SELECT next_seq, typing_until FROM keyboard_seqs WHERE session = ?", (session,)
+            ).fetchone()
+            if row is None:
+                # A new session; forget the ones gone quiet
+                stale = now - idle_seconds
+                db.execute("DELETE FROM keyboard_skipped WHERE session IN "
+                           "(SELECT session FROM keyboard_seqs WHERE last_seen < ?)", (stale,))
+                db.execute("DELETE FROM keyboard_seqs WHERE last_seen < ?", (stale,))
+                next_seq, typing_until = 1, 0.0
+            else:
+                next_seq, typing_until = row['next_seq'], row['typing_until']
+
+            skipped = db.execute(
+                "DELETE FROM keyboard_skipped WHERE session = ? AND seq = ?", (session, seq)
+            ).rowcount
+            if skipped:
+                state = "skipped"
+            elif seq < next_seq:
+                state = "duplicate"
+            elif seq > next_seq or typing_until > now:
+                state = "wait"
+            else:
+                state = "run"
+                typing_until = now + lease
+            db.execute(
+                "INSERT INTO keyboard_seqs (session, next_seq, typing_until, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (session) DO UPDATE SET typing_until = excluded.typing_until, "
+                "last_seen = excluded.last_seen",
+                (session, next_seq, typing_until, now)
+            )
+            return {"state": state, "expected": next_seq}
+        return self._transaction(claim)
+
+    def finish_keyboard_seq(self, session: str, seq: int, now: float):
+        """Release a claimed seq; the session moves on to seq + 1"""
+        self._db().execute(
+            "UPDATE keyboard_seqs SET next_seq = ?, typing_until = 0, last_seen = ? "
+            "WHERE session = ? AND next_seq = ?",
+            (seq + 1, now, session, seq)
+        )
+
+    def skip_keyboard_seqs(self, session: str, expected: int, seq: int, now: float,
+                           limit: int = 1024) -> bool:
+        """Give up on seqs expected..seq-1 so ``seq`` can be typed.
+
+        False when another worker moved the session on meanwhile (or is
+        typing ``expected``), in which case the caller claims again.
+        """
+        def skip(db):
+            row = db.execute(
+                "SELECT next_seq, typing_until FROM keyboard_seqs WHERE session = ?", (session,)
+            ).fetchone()
+            if row is None or row['next_seq'] != expected or row['typing_until'] > now:
+                return False
+            db.executemany(
+                "INSERT OR IGNORE INTO keyboard_skipped (session, seq) VALUES (?, ?)",
+                [(session, gap) for gap in range(expected, seq)]
+            )
+            # Keep the most recent gaps; anything older is long past resending
+            db.execute("DELETE FROM keyboard_skipped WHERE session = ? AND seq < ?", (session, seq - limit))
+            db.execute("UPDATE keyboard_seqs SET next_seq = ?, last_seen = ? WHERE session = ?",
+                       (seq, now, session))
+            return True
+        return self._transaction(skip)
+
+    # ---- traffic counters (SessionStats with several workers) ----
+    def save_session_stats(self, worker: str, stats: List[dict]):
+        """Replace ``worker``'s counters for the given devices"""
+        self._db().executemany(
+            "INSERT OR REPLACE INTO session_stats (worker, code, requests, frames_sent, bytes_out, "
+            "input_events, latencies, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(worker, row['code'], row['requests'], row['frames_sent'], row['bytes_out'],
+              row['input_events'], json.dumps(row['latencies']), row['last_seen']) for row in stats]
+        )
+
+    def load_session_stats(self, code: str) -> List[dict]:
+        """Every worker's counters for one device"""
+        rows = self._db().execute("SELECT * FROM session_stats WHERE code = ?", (code,))
+        return [dict(row, latencies=json.loads(row['latencies'])) for row in rows]
+
+    def retain_session_stats(self, codes: Iterable[str]):
+        """Drop counters of devices that are no longer connected"""
+        keep = list(codes)
+        placeholders = ", ".join("?" * len(keep))
+        self._db().execute(f"DELETE FROM session_stats WHERE code NOT IN ({placeholders})", keep)
+
+
+def default_sqlite_path() -> str:
+    return os.path.join(tempfile.gettempdir(), "smartdesk_sessions.db")
+
+
+def create_session_store(url: Optional[str] = None):
+    """Build a store from a URL such as ``memory`` or ``sqlite:///path/to.db``.
+
+    Defaults to the SMARTDESK_SESSION_STORE environment variable, which the
+    multi-worker launcher sets so every worker opens the same database.
+    """
+    url = url or os.environ.get("SMARTDESK_SESSION_STORE", "memory")
+    if url == "memory":
+        return MemorySessionStore()
+    if url.startswith("sqlite:///"):
+        # sqlite:///relative.db → relative.db, sqlite:////abs.db → /abs.db
+        path = url[len("sqlite:///"):]
+        return SQLiteSessionStore(path or default_sqlite_path())
+    raise ValueError(f"Unknown session store: {url}")
+
+
+def shared_session_store():
+    """The configured store if worker processes share it, else None"""
+    store = create_session_store()
+    return store if store.shared else None
@@ -0,0 +1,70 @@
+# File: core/session_tokens.py
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from typing import Dict, Optional
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SessionTokenSigner:
+    """Signed, expiring session tokens checked with pure CPU work.
+
+    A token is ``<base64url(json claims)>.<base64url(HMAC-SHA256)>``. Any
+    process holding the same secret can verify it without a store lookup;
+    the only shared state is a small set of revoked session ids.
+    """
+
+    def __init__(self, secret: Optional[bytes] = None, ttl_seconds: Optional[int] = None):
+        env_secret = os.environ.get("SMARTDESK_TOKEN_SECRET")
+        # Workers of one deployment must share the secret (the launcher sets it)
+        self.secret = secret or (bytes.fromhex(env_secret) if env_secret else secrets.token_bytes(32))
+        self.ttl_seconds = ttl_seconds or int(os.environ.get("SMARTDESK_TOKEN_TTL", 12 * 3600))
+        self._revoked: Dict[str, float] = {}  # session id → token expiry
+
+    def _sign(self, body: str) -> str:
+        return _b64encode(hmac.new(self.secret, body.encode("ascii"), hashlib.sha256).digest())
+
+    def mint(self, session_id: str, code: str, device_info: str) -> dict:
+        """New token for an approved session; returns the token and its claims"""
+        now = int(time.time())
+        claims = {
+            "sid": session_id,
+            "code": code,
+            "device": device_info,
+            "iat": now,
+            "exp": now + self.ttl_seconds,
+        }
+        body = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        return {"token": f"{body}.{self._sign(body)}", "claims": claims}
+
+    def verify(self, token: str) -> Optional[dict]:
+        """Claims of a valid, unexpired, unrevoked token; None otherwise"""
+        body, _, signature = token.partition(".")
+        try:
+            if not body or not signature or not hmac.compare_digest(signature, self._sign(body)):
+                return None
+            claims = json.loads(_b64decode(body))
+        except (ValueError, TypeError):
+            return None
+
+        if claims.get("exp", 0) < time.time() or claims.get("sid") in self._revoked:
+            return None
+        return claims
+
+    def revoke(self, session_id: str, expires_at: float):
+        self._revoked[session_id] = expires_at
+
+    def set_revoked(self, revoked: Dict[str, float]):
+        """Replace the local revocation set (synced from the session store)"""
+        self._revoked = dict(revoked)
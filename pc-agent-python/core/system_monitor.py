@@ -35,11 +35,17 @@ class SystemMonitor:
         return round(upload_speed + download_speed, 1)
     
     def get_all_metrics(self):
-        """Get all system metrics"""
+        """Get all system metrics (display strings plus the raw numbers)"""
+        cpu = self.get_cpu_usage()
+        ram = self.get_ram_usage()
+        net = self.get_network_usage()
         return {
-            "cpu": f"{self.get_cpu_usage():.1f}%",
-            "ram": f"{self.get_ram_usage():.1f}%",
-            "net": f"{self.get_network_usage()} KB/s"
+            "cpu": f"{cpu:.1f}%",
+            "ram": f"{ram:.1f}%",
+            "net": f"{net} KB/s",
+            "cpu_percent": cpu,
+            "ram_percent": ram,
+            "net_kbps": net
         }
 
 # Global instance
@@ -1,18 +1,67 @@
-from fastapi import FastAPI, Request, HTTPException
+from core.services import services
+import time
+_imports_started = time.perf_counter()
+from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect, Depends
+from starlette.requests import HTTPConnection
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from core.screen_capture import ScreenCapture
-from core.system_monitor import system_monitor
-from core.command_executor import command_executor
-from core.connection_manager import connection_manager
-import time
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+import os
 import socket
-from fastapi.responses import Response
+import asyncio
+from fastapi.responses import Response, StreamingResponse
 import json
+import math
+import hashlib
+import functools
+import gzip
+import mimetypes
+from urllib.parse import quote
+import anyio
+import anyio.to_thread
+from typing import Optional
+from core.file_transfer import RangeNotSatisfiable, UploadIncomplete  # stdlib-only module
+from core.frame_publisher import FrameNotReady  # stdlib-only module
+from core.rate_limiter import rate_limiter  # stdlib-only module
+from core.session_recorder import session_recorder  # stdlib-only module
+from core.session_stats import session_stats  # stdlib-only module
+from core.response_models import SystemMetrics, SystemInfoResponse, DirectoryListing
+try:
+    # orjson serializes several times faster than the stdlib json encoder
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
+services.record_import("fastapi (main)", _imports_started)
+
+app = FastAPI(title="SmartDesk Mirror - PC Agent", default_response_class=FastJSONResponse)
+
+# ---------------- SUBSYSTEMS ----------------
+# Built on first use (see core/services.py) so startup doesn't pay for
+# pyautogui / PIL / qrcode and a headless box can still serve the API
+def _create_screen():
+    # Multi-worker mode: frames come from the shared capture process (see run_production)
+    if os.environ.get("SMARTDESK_FRAME_SHM"):
+        return services.load("core.frame_publisher").SharedFrameSource(os.environ["SMARTDESK_FRAME_SHM"])
+    return services.load("core.screen_capture").ScreenCapture()
 
-app = FastAPI(title="SmartDesk Mirror - PC Agent")
+services.register("screen", _create_screen)
+services.register("connection_manager", lambda: services.load("core.connection_manager").connection_manager)
+services.register("command_executor", lambda: services.load("core.command_executor").command_executor)
+services.register("system_monitor", lambda: services.load("core.system_monitor").system_monitor)
+services.register("cursor_tracker", lambda: services.load("core.cursor_tracker").cursor_tracker)
+services.register("file_transfer", lambda: services.load("core.file_transfer").file_transfer)
+services.register("disk_usage", lambda: services.load("core.disk_usage").disk_usage_analyzer)
 
-screen = ScreenCapture()
+screen = services.lazy("screen")
+connection_manager = services.lazy("connection_manager")
+command_executor = services.lazy("command_executor")
+system_monitor = services.lazy("system_monitor")
+cursor_tracker = services.lazy("cursor_tracker")
+file_transfer = services.lazy("file_transfer")
+disk_usage = services.lazy("disk_usage")
+# --------------------------------------------
 
 # ---------------- CORS FIX ----------------
 app.add_middleware(
@@ -21,20 +70,292 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Accept-Ranges", "Content-Range", "Content-Length", "Content-Disposition"],
 )
 # ------------------------------------------
 
+# ---------------- JSON COMPRESSION ----------------
+class JSONGZipMiddleware:
+    """gzip for large JSON bodies (directory listings, process tables, ...).
+
+    Starlette's GZipMiddleware would also compress file downloads (breaking
+    Content-Length / Content-Range for resumable transfers), hold back
+    streamed NDJSON inside the compressor, and spend level-9 CPU on every
+    screen frame. This only touches complete application/json bodies of at
+    least ``minimum_size`` bytes, for clients that send Accept-Encoding: gzip,
+    outside ``exclude_paths`` (screen frames: already-compressed image data
+    on the hottest path, where gzip costs CPU and saves next to nothing).
+    """
+
+    def __init__(self, app, minimum_size: int = 4096, compresslevel: int = 5, exclude_paths=()):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.exclude_paths = tuple(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["path"] in self.exclude_paths
+                or "gzip" not in Headers(scope=scope).get("accept-encoding", "")):
+            await self.app(scope, receive, send)
+            return
+
+        held_start = None
+
+        async def gzip_send(message):
+            nonlocal held_start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if headers.get("content-type", "").startswith("application/json") and "content-encoding" not in headers:
+                    held_start = message  # decide once the body size is known
+                    return
+            elif message["type"] == "http.response.body" and held_start is not None:
+                start, held_start = held_start, None
+                body = message.get("body", b"")
+                if not message.get("more_body", False) and len(body) >= self.minimum_size:
+                    body = gzip.compress(body, self.compresslevel)
+                    headers = MutableHeaders(raw=list(start["headers"]))
+                    headers["Content-Encoding"] = "gzip"
+                    headers["Content-Length"] = str(len(body))
+                    headers.add_vary_header("Accept-Encoding")
+                    await send(dict(start, headers=headers.raw))
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start)
+            await send(message)
+
+        await self.app(scope, receive, gzip_send)
+
+# Inside SessionStatsMiddleware, so the stats count compressed bytes
+app.add_middleware(JSONGZipMiddleware, exclude_paths=("/mobile/screen",))
+# --------------------------------------------------
+
+# ---------------- SESSION STATS ----------------
+class SessionStatsMiddleware:
+    """Counts /mobile/* requests, bytes out and latency per device.
+
+    Plain ASGI rather than BaseHTTPMiddleware, which would add a task and a
+    body-streaming wrapper to every request. Latency is measured to the start
+    of the response so long downloads don't swamp the percentiles.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/mobile/"):
+            await self.app(scope, receive, send)
+            return
+
+        # require_session leaves the authenticated session here (request.state)
+        state = scope.setdefault("state", {})
+        started = time.perf_counter()
+        latency = None
+        sent = 0
+
+        async def counting_send(message):
+            nonlocal latency, sent
+            if message["type"] == "http.response.start":
+                latency = time.perf_counter() - started
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, counting_send)
+        finally:
+            session = state.get("session")
+            if session and latency is not None:
+                session_stats.record_request(session["code"], latency, sent)
+
+app.add_middleware(SessionStatsMiddleware)
+# -----------------------------------------------
+
+# ---------------- MOBILE AUTH ----------------
+class NotAuthorized(Exception):
+    pass
+
+@app.exception_handler(NotAuthorized)
+async def not_authorized_handler(request: Request, exc: NotAuthorized):
+    return JSONResponse(
+        status_code=401,
+        content={"error": "No active connection or connection not approved"}
+    )
+
+async def authenticate(conn: HTTPConnection) -> Optional[dict]:
+    """Session claims for a request or WebSocket, or None.
+
+    Preferred: the signed token from /connection/status, sent as
+    "Authorization: Bearer <token>", x-session-token or ?token=. It is checked
+    with an HMAC only, so any worker can verify it. Older clients sending
+    x-connection-code (or ?code=) still work via a session store lookup.
+    """
+    authorization = conn.headers.get("authorization", "")
+    token = (authorization[7:] if authorization.lower().startswith("bearer ") else None) \
+        or conn.headers.get("x-session-token") or conn.query_params.get("token")
+    if token:
+        # HMAC only; revocations are synced in the background (sync_revocations_forever)
+        return connection_manager.verify_session_token(token)
+
+    code = conn.headers.get("x-connection-code") or conn.query_params.get("code")
+    if code and await run_mobile(connection_manager_call, "is_connection_active", code):
+        return {"sid": None, "code": code}
+    return None
+
+async def require_session(request: Request) -> dict:
+    """Dependency for /mobile/* endpoints.
+
+    Async: token checks are CPU only and run inline; the legacy code lookup
+    (a session store query) goes to the mobile lane.
+    """
+    session = await authenticate(request)
+    if session is None:
+        raise NotAuthorized()
+    request.state.session = session  # for SessionStatsMiddleware
+    return session
+# ---------------------------------------------
+
+# ---------------- ADMISSION CONTROL ----------------
+# Per-client token buckets (core/rate_limiter.py) keep one phone from starving
+# the others, and blocking mobile work runs on its own thread budget so the
+# local desktop app's endpoints always find a free worker thread.
+MOBILE_WORKER_THREADS = int(os.environ.get("SMARTDESK_MOBILE_THREADS", 16))
+_mobile_lane = None
+
+# execute-command types / file operations charged to the "expensive" bucket
+EXPENSIVE_COMMANDS = {"system_info", "process_list"}
+EXPENSIVE_FILE_OPERATIONS = {"disk_usage", "search_files"}
+
+def command_category(command_type, command_data) -> str:
+    """Rate-limit bucket for an execute-command request"""
+    if command_type == "process_list":
+        # Diff polls (with "since") are cheap: the table refreshes at most
+        # once a second whoever asks. Only full listings are expensive.
+        since = command_data.get("since") if isinstance(command_data, dict) else None
+        return "expensive" if since is None else "input"
+    if command_type in EXPENSIVE_COMMANDS or (
+        command_type == "file_operation" and isinstance(command_data, dict)
+        and command_data.get("type") in EXPENSIVE_FILE_OPERATIONS
+    ):
+        return "expensive"
+    return "input"
+
+class RateLimited(Exception):
+    def __init__(self, category: str, retry_after: float):
+        self.category = category
+        self.retry_after = retry_after
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+        content={
+            "error": f"Too many {exc.category} requests",
+            "retry_after": round(exc.retry_after, 3)
+        }
+    )
+
+def session_key(session: dict) -> str:
+    return session.get("sid") or f"code:{session.get('code')}"
+
+def enforce_rate_limit(session: dict, category: str):
+    retry_after = rate_limiter.check(session_key(session), category)
+    if retry_after:
+        raise RateLimited(category, retry_after)
+
+def admit(category: str):
+    """Dependency: authenticated session that still has budget in ``category``"""
+    async def dependency(session: dict = Depends(require_session)) -> dict:
+        enforce_rate_limit(session, category)
+        return session
+    return dependency
+
+async def run_mobile(func, *args, **kwargs):
+    """Run blocking work for a mobile client on the mobile thread lane"""
+    global _mobile_lane
+    if _mobile_lane is None:
+        # Must be created inside the running event loop
+        _mobile_lane = anyio.CapacityLimiter(MOBILE_WORKER_THREADS)
+    return await anyio.to_thread.run_sync(functools.partial(func, *args, **kwargs), limiter=_mobile_lane)
+
+async def iterate_mobile(iterator):
+    """Async iteration over a blocking iterator, each step on the mobile lane.
+
+    For StreamingResponse bodies: a sync generator would otherwise be
+    stepped on Starlette's default threadpool, shared with the desktop app.
+    """
+    done = object()
+    try:
+        while True:
+            item = await run_mobile(next, iterator, done)
+            if item is done:
+                break
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            # Release file handles / scandir iterators even when the client went away
+            with anyio.CancelScope(shield=True):
+                await run_mobile(close)
+
+def connection_manager_call(method: str, *args):
+    """Session store work for run_mobile / run_in_threadpool: the lazy proxy
+    (building the manager and opening its store) resolves off the event loop"""
+    return getattr(connection_manager, method)(*args)
+
+async def sync_revocations_forever():
+    """Pull session revocations made by other workers, off the event loop"""
+    while True:
+        try:
+            await run_mobile(connection_manager_call, "sync_revocations")
+        except Exception as e:
+            print(f"⚠️ Revocation sync failed: {e}")
+        await asyncio.sleep(connection_manager.revocation_sync_seconds)
+
+async def flush_session_stats_forever():
+    """Publish this worker's traffic counters for /connection/active (multi-worker mode)"""
+    while True:
+        await asyncio.sleep(session_stats.flush_seconds)
+        try:
+            await run_mobile(session_stats.flush)
+        except Exception as e:
+            print(f"⚠️ Session stats flush failed: {e}")
+
+# ----------------------------------------------------
+
+_background_tasks = []
+
+@app.on_event("startup")
+def report_startup():
+    services.mark_ready()
+    print(f"⏱️ Agent ready in {services.report()['startup_ms']} ms")
+
+@app.on_event("startup")
+async def start_background_tasks():
+    _background_tasks.append(asyncio.create_task(sync_revocations_forever()))
+    _background_tasks.append(asyncio.create_task(flush_session_stats_forever()))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+
 @app.get("/")
 def home():
     return {"status": "PC Agent Running"}
 
 # FIXED: Allow desktop app to access these without authentication
-@app.get("/system-metrics")
+# The typed endpoints below declare their response_model for the schema but
+# return FastJSONResponse themselves: their payloads are built by our own
+# code with the model's types, so FastAPI's validate + jsonable_encoder
+# pass would only serialize them twice.
+@app.get("/system-metrics", response_model=SystemMetrics)
 def get_system_metrics():
     """Get real-time system metrics (CPU, RAM, Network) - No auth for desktop app"""
     try:
         metrics = system_monitor.get_all_metrics()
-        return metrics
+        return FastJSONResponse(metrics)
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -79,9 +400,11 @@ def get_pending_requests():
 
 @app.get("/connection/active")
 def get_active_connections():
-    """Get all active connections - No auth for desktop app"""
+    """Get all active connections with their traffic stats - No auth for desktop app"""
     try:
-        return connection_manager.get_active_connections()
+        connections = connection_manager.get_active_connections()
+        session_stats.retain(conn["code"] for conn in connections)
+        return [dict(conn, stats=session_stats.snapshot(conn["code"])) for conn in connections]
     except Exception as e:
         print(f"Error getting active connections: {e}")
         return JSONResponse(
@@ -99,7 +422,7 @@ async def connection_respond(request: Request):
         
         print(f"💬 Connection response: request_id={request_id}, accepted={accepted}")
         
-        connection_manager.handle_connection_response(request_id, accepted)
+        await run_in_threadpool(connection_manager_call, "handle_connection_response", request_id, accepted)
         
         return {
             "success": True,
@@ -112,6 +435,49 @@ async def connection_respond(request: Request):
             content={"success": False, "message": str(e)}
         )
 
+@app.post("/connection/disconnect")
+async def connection_disconnect(request: Request):
+    """End a device's connection and revoke its session token - No auth for desktop app"""
+    try:
+        body = await request.json()
+        code = body.get("code")
+        removed = await run_in_threadpool(connection_manager_call, "disconnect", code)
+        return {
+            "success": removed > 0,
+            "message": "Connection ended" if removed else "No active connection for this code"
+        }
+    except Exception as e:
+        print(f"❌ Disconnect error: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": str(e)}
+        )
+
+@app.get("/recording")
+def get_recording_status():
+    """Recorder state and saved recordings - No auth for desktop app"""
+    return dict(session_recorder.status(), recordings=session_recorder.list_recordings())
+
+@app.post("/recording/start")
+async def start_recording(request: Request):
+    """Start recording screen frames and commands - No auth for desktop app"""
+    try:
+        body = await request.json() if await request.body() else {}
+        result = session_recorder.start(body.get("name"))
+        return result if result["success"] else JSONResponse(status_code=409, content=result)
+    except Exception as e:
+        print(f"❌ Recording start error: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "error": str(e)}
+        )
+
+@app.post("/recording/stop")
+def stop_recording():
+    """Stop the running recording - No auth for desktop app"""
+    result = session_recorder.stop()
+    return result if result["success"] else JSONResponse(status_code=409, content=result)
+
 # Mobile endpoints - These require connection code authentication
 @app.post("/connection/request")
 async def connection_request(request: Request):
@@ -149,7 +515,7 @@ async def connection_request(request: Request):
                 content={"success": False, "message": "Code is required"}
             )
         
-        if not connection_manager.validate_code(code):
+        if not await run_mobile(connection_manager_call, "validate_code", code):
             print(f"❌ Invalid code: {code}")
             return {
                 "success": False,
@@ -157,7 +523,7 @@ async def connection_request(request: Request):
             }
         
         # Add connection request with enhanced info
-        request_id = connection_manager.add_connection_request(code, enhanced_device_info)
+        request_id = await run_mobile(connection_manager_call, "add_connection_request", code, enhanced_device_info)
         print(f"✅ Connection request added: request_id={request_id}")
         
         return {
@@ -182,6 +548,8 @@ def get_connection_status(code: str):
         
         return {
             "active": is_active,
+            # Send as "Authorization: Bearer <token>" on /mobile/* requests
+            "token": connection_manager.get_session_token(code) if is_active else None,
             "message": "Connection active" if is_active else "Connection not active or pending"
         }
     except Exception as e:
@@ -192,25 +560,53 @@ def get_connection_status(code: str):
         )
 
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check per RFC 9110: "*", a list of tags, weak comparison"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
 @app.get("/mobile/screen")
-def get_mobile_screen(request: Request):
+async def get_mobile_screen(request: Request, session: dict = Depends(admit("frame"))):
     """Get screen capture for mobile app"""
-    # Check if connection is active
-    code = request.headers.get("x-connection-code")
-    if not code or not connection_manager.is_connection_active(code):
-        return JSONResponse(
-            status_code=401, 
-            content={"error": "No active connection or connection not approved"}
-        )
-    
     try:
-        frame = screen.capture()
+        # Optional per-stream encoder settings, e.g. ?encoder=turbo&quality=50&subsampling=4:2:0
+        params = request.query_params
+        frame = await run_mobile(
+            screen.capture_frame,
+            encoder=params.get("encoder"),
+            quality=params.get("quality"),
+            subsampling=params.get("subsampling"),
+        )
         if frame:
-            print(f"✅ Screen captured, returning direct data URL (length: {len(frame)})")
+            headers = {"ETag": frame["etag"], "Cache-Control": "no-cache"}
+
+            # Unchanged screen → 304 with no body
+            if etag_matches(request.headers.get("if-none-match"), frame["etag"]):
+                return Response(status_code=304, headers=headers)
+
+            if "tiles" in frame:
+                session_stats.record_frame(session["code"])
+                # ?encoder=hybrid → text/photo layer manifest for client-side compositing
+                return FastJSONResponse(content=frame["tiles"], headers=headers)
+
+            session_stats.record_frame(session["code"])
+
+            print(f"✅ Screen captured, returning direct data URL (length: {len(frame['data_url'])})")
             # Return as plain text with the data URL directly
             return Response(
-                content=frame,
-                media_type="text/plain"
+                content=frame["data_url"],
+                media_type="text/plain",
+                headers=headers
             )
         else:
             print("❌ Screen capture returned None")
@@ -218,6 +614,18 @@ def get_mobile_screen(request: Request):
                 status_code=500,
                 content={"error": "Screen capture failed"}
             )
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": str(e)}
+        )
+    except FrameNotReady as e:
+        # Multi-worker mode right after startup: no frame published yet
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": "1"},
+            content={"error": str(e)}
+        )
     except Exception as e:
         print(f"❌ Screen capture error: {e}")
         import traceback
@@ -227,51 +635,477 @@ def get_mobile_screen(request: Request):
             content={"error": f"Screen capture failed: {str(e)}"}
         )
 
+def _watch_disconnect(websocket: WebSocket):
+    """(event, task): the event is set once the client goes away.
+
+    Push-only streams may go a long time without sending (idle screen), so
+    they can't rely on send() failing to notice a dropped client. The caller
+    keeps the reader task (the loop only holds a weak reference) and cancels
+    it when the stream ends.
+    """
+    closed = asyncio.Event()
+
+    async def reader():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+        except Exception:
+            pass
+        finally:
+            closed.set()
+
+    return closed, asyncio.create_task(reader())
+
+async def send_tracked(websocket: WebSocket, session: dict, message: dict, frame: bool = False):
+    """send_json that counts the bytes (and frames) against the device's stats"""
+    text = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+    await websocket.send_text(text)
+    if frame:
+        session_stats.record_frame(session["code"], len(text))
+    else:
+        session_stats.record_sent(session["code"], len(text))
+
+@app.websocket("/mobile/ws/screen")
+async def mobile_screen_stream(websocket: WebSocket):
+    """Push screen frames to the mobile app, skipping unchanged frames.
+
+    Auth like the HTTP endpoints (?token= for clients that can't set headers).
+    Optional ?fps= (1-30) plus the
+    same encoder settings as /mobile/screen. Messages are JSON:
+    {"type": "frame", "etag": ..., "width": ..., "height": ..., "data": <data URL>}
+    With ?encoder=hybrid, "tiles": <layer manifest> replaces "data".
+    """
+    params = websocket.query_params
+    session = await authenticate(websocket)
+    if session is None:
+        await websocket.close(code=4401)
+        return
+
+    try:
+        fps = max(1.0, min(30.0, float(params.get("fps", 10))))
+    except ValueError:
+        fps = 10.0
+
+    await websocket.accept()
+    closed, watcher = _watch_disconnect(websocket)
+    last_etag = None
+    try:
+        while not closed.is_set() and await authenticate(websocket) is not None:
+            started = time.monotonic()
+
+            # Shares the per-client frame budget with /mobile/screen polling
+            retry_after = rate_limiter.check(session_key(session), "frame")
+            if retry_after:
+                try:
+                    await asyncio.wait_for(closed.wait(), retry_after)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                frame = await run_mobile(
+                    screen.capture_frame,
+                    params.get("encoder"),
+                    params.get("quality"),
+                    params.get("subsampling"),
+                )
+            except FrameNotReady:
+                frame = None  # publisher still starting; try again next tick
+
+            # Idle desktop → nothing on the wire
+            if frame and frame["etag"] != last_etag:
+                message = {
+                    "type": "frame",
+                    "etag": frame["etag"],
+                    "width": frame["width"],
+                    "height": frame["height"],
+                }
+                if "tiles" in frame:
+                    message["tiles"] = frame["tiles"]
+                else:
+                    message["data"] = frame["data_url"]
+                await send_tracked(websocket, session, message, frame=True)
+                last_etag = frame["etag"]
+
+            try:
+                await asyncio.wait_for(closed.wait(), max(0.0, 1.0 / fps - (time.monotonic() - started)))
+            except asyncio.TimeoutError:
+                pass
+    except (WebSocketDisconnect, ValueError):
+        pass
+    except Exception as e:
+        print(f"❌ Screen stream error: {e}")
+    finally:
+        watcher.cancel()
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
 @app.post("/mobile/execute-command")
-async def execute_mobile_command(request: Request):
+async def execute_mobile_command(request: Request, session: dict = Depends(require_session)):
     """Execute commands sent from mobile app"""
-    # Check if connection is active
-    code = request.headers.get("x-connection-code")
-    if not code or not connection_manager.is_connection_active(code):
-        return JSONResponse(
-            status_code=401, 
-            content={"error": "No active connection or connection not approved"}
-        )
-    
     try:
         body = await request.json()
         command_type = body.get("type")
         command_data = body.get("data", {})
         
-        result = command_executor.execute_command(command_type, command_data)
-        return result
+        category = command_category(command_type, command_data)
+        enforce_rate_limit(session, category)
+        if category == "input" and command_type != "process_list":
+            session_stats.record_input(session["code"])
+        
+        result = await run_mobile(
+            command_executor.execute_command, command_type, command_data, session_key(session)
+        )
+        # Arbitrary per-command shapes: render directly, no jsonable_encoder pass
+        return FastJSONResponse(result)
         
+    except RateLimited:
+        raise
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={"success": False, "error": f"Command execution failed: {str(e)}"}
         )
 
-@app.get("/mobile/system-info")
-def get_mobile_system_info(request: Request):
-    """Get system info for mobile app"""
-    # Check if connection is active
-    code = request.headers.get("x-connection-code")
-    if not code or not connection_manager.is_connection_active(code):
+def sample_cursor() -> dict:
+    """Pointer sample, for run_mobile: the pyautogui query (and, on first use,
+    building the tracker behind the lazy proxy) stays off the event loop"""
+    return cursor_tracker.sample()
+
+@app.get("/mobile/cursor")
+async def get_mobile_cursor(request: Request, session: dict = Depends(require_session)):
+    """Get the pointer position (normalized 0-1) for client-side cursor drawing"""
+    try:
+        # Returned as a response directly: skips jsonable_encoder on this high-rate poll
+        return FastJSONResponse(await run_mobile(sample_cursor))
+    except Exception as e:
         return JSONResponse(
-            status_code=401, 
-            content={"error": "No active connection or connection not approved"}
+            status_code=500,
+            content={"error": f"Cursor sampling failed: {str(e)}"}
         )
-    
+
+@app.websocket("/mobile/ws/cursor")
+async def mobile_cursor_stream(websocket: WebSocket):
+    """Push pointer moves at high frequency, independent of the frame stream.
+
+    Auth like /mobile/ws/screen. Optional ?hz= (1-120, default 60). Only sends
+    when the pointer moved: {"type": "cursor", "seq": ..., "x": ..., "y": ...}
+    """
+    params = websocket.query_params
+    session = await authenticate(websocket)
+    if session is None:
+        await websocket.close(code=4401)
+        return
+
+    try:
+        hz = max(1.0, min(120.0, float(params.get("hz", 60))))
+    except ValueError:
+        hz = 60.0
+
+    await websocket.accept()
+    closed, watcher = _watch_disconnect(websocket)
+    last_seq = None
+    checked_at = time.monotonic()
     try:
-        result = command_executor.get_system_info()
-        return result
+        while not closed.is_set():
+            # Re-check approval about once a second, not on every 16 ms tick
+            if time.monotonic() - checked_at > 1.0:
+                if await authenticate(websocket) is None:
+                    break
+                checked_at = time.monotonic()
+
+            sample = await run_mobile(sample_cursor)
+            if sample["seq"] != last_seq:
+                await send_tracked(websocket, session, sample)
+                last_seq = sample["seq"]
+
+            try:
+                await asyncio.wait_for(closed.wait(), 1.0 / hz)
+            except asyncio.TimeoutError:
+                pass
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"❌ Cursor stream error: {e}")
+    finally:
+        watcher.cancel()
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+@app.websocket("/mobile/ws/keyboard")
+async def mobile_keyboard_stream(websocket: WebSocket):
+    """Live typing from the phone.
+
+    Auth like /mobile/ws/screen. Each message is keyboard command data
+    ({"seq": n, "text": ...}, {"seq": n, "keys": "ctrl+s"} or {"actions": [...]})
+    and is answered with {"type": "ack", "seq": n, "success": ...} once typed.
+    Messages are typed in seq order; seq numbers are shared with the
+    HTTP keyboard command, so a batch retried over HTTP is not typed twice.
+    Messages are handled one at a time, so a seq ahead of the next expected
+    one is refused at once (ack with "expected") rather than waited on; the
+    client resends from "expected". A refused or rate-limited seq is never
+    consumed.
+    """
+    session = await authenticate(websocket)
+    if session is None:
+        await websocket.close(code=4401)
+        return
+
+    await websocket.accept()
+    key = session_key(session)
+    checked_at = time.monotonic()
+    try:
+        while True:
+            data = await websocket.receive_json()
+
+            if time.monotonic() - checked_at > 1.0:
+                if await authenticate(websocket) is None:
+                    break
+                checked_at = time.monotonic()
+
+            seq = data.get("seq") if isinstance(data, dict) else None
+            retry_after = rate_limiter.check(key, "input")
+            if retry_after:
+                # Not typed; the client resends it (same seq) after retry_after
+                await websocket.send_json({
+                    "type": "ack",
+                    "seq": seq,
+                    "success": False,
+                    "error": "Too many input requests",
+                    "retry_after": round(retry_after, 3)
+                })
+                continue
+
+            result = await run_mobile(command_executor.simulate_keyboard, data, key, False)
+            session_stats.record_input(session["code"])
+            await send_tracked(websocket, session, dict(result, type="ack", seq=seq))
+    except (WebSocketDisconnect, ValueError):
+        pass
+    except Exception as e:
+        print(f"❌ Keyboard stream error: {e}")
+    finally:
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+@app.get("/mobile/system-info", response_model=SystemInfoResponse)
+async def get_mobile_system_info(request: Request, session: dict = Depends(admit("expensive"))):
+    """Get system info for mobile app"""
+    try:
+        result = await run_mobile(command_executor.get_system_info)
+        return FastJSONResponse(result)
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={"success": False, "error": str(e)}
         )
 
+# ---------------- FILE TRANSFER ----------------
+@app.get("/mobile/files/list", response_model=DirectoryListing)
+async def list_mobile_directory(request: Request, path: str, session: dict = Depends(admit("transfer"))):
+    """Directory entries with sizes and mtimes (gzip-compressed when large)"""
+    try:
+        return FastJSONResponse(dict(await run_mobile(file_transfer.list_directory, path), success=True))
+    except FileNotFoundError:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "error": f"Directory not found: {path}"}
+        )
+    except (NotADirectoryError, PermissionError) as e:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": str(e)}
+        )
+
+def _attachment_header(path: str) -> str:
+    filename = os.path.basename(path)
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+@app.get("/mobile/files/download")
+async def download_mobile_file(request: Request, path: str, session: dict = Depends(admit("transfer"))):
+    """Stream a file to the mobile app; supports Range/If-Range for resume.
+
+    All file I/O runs on the mobile lane (FileResponse would read on the
+    default threadpool), so long downloads can't starve the desktop app.
+    """
+    try:
+        info = await run_mobile(file_transfer.file_info, path)
+        if not await run_mobile(os.path.isfile, path):
+            return JSONResponse(status_code=400, content={"error": f"Not a file: {path}"})
+
+        headers = {"Accept-Ranges": "bytes", "ETag": info["etag"]}
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+
+        # If-Range: only resume when the file is still the one the client started on
+        if range_header and (not if_range or if_range == info["etag"]):
+            byte_range = file_transfer.parse_range(range_header, info["size"])
+            if byte_range:
+                start, end = byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{info['size']}"
+                headers["Content-Length"] = str(end - start + 1)
+                return StreamingResponse(
+                    iterate_mobile(file_transfer.iter_file(path, start, end)),
+                    status_code=206,
+                    media_type="application/octet-stream",
+                    headers=headers
+                )
+
+        # Whole file, streamed in chunks
+        headers["Content-Length"] = str(info["size"])
+        headers["Content-Disposition"] = _attachment_header(path)
+        return StreamingResponse(
+            iterate_mobile(file_transfer.iter_file(path, 0, info["size"] - 1)),
+            media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+            headers=headers
+        )
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": f"File not found: {path}"})
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{info['size']}"})
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"Download failed: {str(e)}"}
+        )
+
+@app.get("/mobile/files/checksum")
+async def checksum_mobile_file(request: Request, path: str, algorithm: str = "sha256", start: int = 0,
+                         end: int = None, session: dict = Depends(admit("transfer"))):
+    """Hash a file or byte range incrementally so the client can verify a transfer"""
+    try:
+        return dict(await run_mobile(file_transfer.checksum, path, algorithm, start, end), success=True)
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"success": False, "error": f"File not found: {path}"})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+
+@app.get("/mobile/files/upload-status")
+async def mobile_upload_status(request: Request, path: str, session: dict = Depends(admit("transfer"))):
+    """Bytes already received for an interrupted upload (resume from there)"""
+    try:
+        return dict(await run_mobile(file_transfer.upload_status, path), success=True)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+
+@app.put("/mobile/files/upload")
+async def upload_mobile_file(request: Request, path: str, offset: int = 0,
+                             complete: bool = False, sha256: str = None, size: int = None,
+                             session: dict = Depends(admit("transfer"))):
+    """Receive a file (or the next piece of one) as a streamed request body.
+
+    Data is appended to ``<path>.part`` at ``offset``, which must equal the
+    bytes received so far. With ``complete=true`` (which needs ``sha256``
+    and/or the total ``size``) the whole file is checked and moved into
+    place - unless this request's body was cut off, in which case it stays
+    a .part to resume from upload-status.
+    """
+    if complete and not sha256 and size is None:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": "complete=true needs sha256 or size"}
+        )
+
+    try:
+        f = await run_mobile(file_transfer.open_upload, path, offset)
+    except ValueError as e:
+        status = await run_mobile(file_transfer.upload_status, path)
+        return JSONResponse(status_code=409, content=dict(status, success=False, error=str(e)))
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+
+    chunk_digest = hashlib.sha256()
+    written = 0
+    interrupted = False
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_mobile(f.write, chunk)
+                chunk_digest.update(chunk)
+                written += len(chunk)
+    except Exception as e:
+        # Whatever arrived is kept; the client resumes from upload-status
+        print(f"⚠️ Upload interrupted after {written} bytes: {e}")
+        interrupted = True
+    finally:
+        await run_mobile(f.close)
+
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) != written:
+        print(f"⚠️ Upload body ended after {written} of {declared} bytes")
+        interrupted = True
+
+    result = {
+        "success": True,
+        "path": path,
+        "received": offset + written,
+        "chunk_length": written,
+        "chunk_sha256": chunk_digest.hexdigest(),
+    }
+    if interrupted:
+        result["interrupted"] = True
+
+    if complete:
+        if interrupted:
+            status = await run_mobile(file_transfer.upload_status, path)
+            return JSONResponse(
+                status_code=409,
+                content=dict(status, success=False, error="Upload body was cut off; resume from received")
+            )
+        try:
+            result["file"] = await run_mobile(
+                file_transfer.finish_upload, path, sha256, "sha256", size
+            )
+        except UploadIncomplete as e:
+            status = await run_mobile(file_transfer.upload_status, path)
+            return JSONResponse(status_code=409, content=dict(status, success=False, error=str(e)))
+        except ValueError as e:
+            return JSONResponse(status_code=422, content={"success": False, "error": str(e)})
+        except Exception as e:
+            return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+
+    return result
+
+@app.get("/mobile/files/disk-usage")
+async def stream_mobile_disk_usage(request: Request, path: str, top: int = 50, refresh: bool = False,
+                                   session: dict = Depends(admit("expensive"))):
+    """Per-directory sizes of path, streamed as NDJSON while the scan runs.
+
+    One {"type": "partial", ...} line per finished child directory, then a
+    final {"type": "done", ...} line with the largest children. ``refresh``
+    re-measures everything instead of using cached listings.
+    """
+    if not await run_mobile(os.path.isdir, path):
+        return JSONResponse(status_code=404, content={"error": f"Directory not found: {path}"})
+
+    def events():
+        try:
+            for event in disk_usage.scan(path, top, refresh):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+
+    # The scan itself runs on the mobile lane, one step per line
+    return StreamingResponse(iterate_mobile(events()), media_type="application/x-ndjson")
+# -----------------------------------------------
+
+@app.get("/debug/startup")
+def debug_startup():
+    """Startup-time report: import cost per module and which subsystems are loaded"""
+    return services.report()
+
 # Add this debug endpoint to test basic functionality
 @app.get("/debug/test")
 def debug_test():
@@ -419,7 +1253,54 @@ def debug_simple_test():
     """Simple test endpoint that returns plain text"""
     return "Hello from PC - This is plain text response"
 
-if __name__ == "__main__":
-    print("🚀 Starting PC Agent...")
+def run_production(host: str, port: int, workers: int, capture_fps: float):
+    """Serve with several worker processes sharing session state and frames"""
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    from core.frame_publisher import FramePublisher
+    import shutil
+    import tempfile
+
+    # Workers are fresh processes: everything they share goes through env vars
+    run_dir = None
+    if "SMARTDESK_SESSION_STORE" not in os.environ:
+        # Sessions don't survive an agent restart, same as single-process mode.
+        # A fresh directory per run, so another running agent's store is untouched
+        run_dir = tempfile.mkdtemp(prefix="smartdesk-")
+        db_path = os.path.join(run_dir, "sessions.db")
+        os.environ["SMARTDESK_SESSION_STORE"] = f"sqlite:///{db_path}"
+    print(f"🗄️ Session store: {os.environ['SMARTDESK_SESSION_STORE']}")
+
+    # Every worker must verify the session tokens any other worker minted
+    if "SMARTDESK_TOKEN_SECRET" not in os.environ:
+        import secrets
+        os.environ["SMARTDESK_TOKEN_SECRET"] = secrets.token_hex(32)
+
+    publisher = FramePublisher(fps=capture_fps)
+    publisher.start()
+    os.environ["SMARTDESK_FRAME_SHM"] = publisher.name
+
+    try:
+        uvicorn.run("main:app", host=host, port=port, workers=workers)
+    finally:
+        publisher.stop()
+        if run_dir:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="SmartDesk Mirror PC Agent")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes; more than 1 enables production mode")
+    parser.add_argument("--capture-fps", type=float, default=10.0,
+                        help="Frame rate of the shared capture process (production mode)")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        print(f"🚀 Starting PC Agent with {args.workers} workers...")
+        run_production(args.host, args.port, args.workers, args.capture_fps)
+    else:
+        print("🚀 Starting PC Agent...")
+        import uvicorn
+        uvicorn.run("main:app", host=args.host, port=args.port, reload=True)
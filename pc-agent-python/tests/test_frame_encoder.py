@@ -0,0 +1,60 @@
+# File: tests/test_frame_encoder.py
+import base64
+import io
+import itertools
+import unittest
+
+from PIL import Image, ImageChops, ImageDraw
+
+from core.frame_encoder import HybridTileEncoder
+
+
+def decode_layer(data_url):
+    return Image.open(io.BytesIO(base64.b64decode(data_url.split(",", 1)[1]))).convert("RGB")
+
+
+def text_tiles(manifest):
+    """Boxes of the tiles the manifest sends losslessly"""
+    tile = manifest["tile_size"]
+    for index, kind in enumerate(manifest["map"]):
+        if kind == "t":
+            x = (index % manifest["cols"]) * tile
+            y = (index // manifest["cols"]) * tile
+            yield (x, y, min(x + tile, manifest["width"]), min(y + tile, manifest["height"]))
+
+
+def ui_screen(colors):
+    """Flat panels with 1-pixel text strokes, colours a few levels apart"""
+    image = Image.new("RGB", (320, 192), colors[0])
+    draw = ImageDraw.Draw(image)
+    for i, color in enumerate(colors):
+        x, y = (i * 37) % 300, (i * 11) % 180
+        draw.line((x, y, x + 12, y + 6), fill=color)
+        draw.point((x + 3, y + 9), fill=color)
+    return image
+
+
+class HybridTileEncoderTests(unittest.TestCase):
+    def assert_text_tiles_exact(self, image):
+        manifest = HybridTileEncoder().encode_tiles(image, 65)
+        self.assertIn("t", manifest["map"])
+        text = decode_layer(manifest["layers"]["text"])
+        for box in text_tiles(manifest):
+            diff = ImageChops.difference(text.crop(box), image.crop(box))
+            self.assertIsNone(diff.getbbox(), f"text tile {box} differs by {diff.getextrema()}")
+
+    def test_close_ui_colours_survive_exactly(self):
+        self.assert_text_tiles_exact(ui_screen([(200, 200, 200), (201, 200, 202), (203, 201, 200), (17, 18, 19), (18, 18, 19)]))
+
+    def test_250_colour_layer_is_exact(self):
+        colors = [(200 + r, 200 + g, 100 + b) for r, g, b in itertools.product(range(8), repeat=3)][:250]
+        image = Image.new("RGB", (256, 128))
+        image.putdata([colors[(x // 3 + y * 7) % 250] for y in range(128) for x in range(256)])
+        manifest = HybridTileEncoder(max_text_colors=256).encode_tiles(image, 65)
+        self.assertEqual(set(manifest["map"]), {"t"})
+        self.assertTrue(manifest["layers"]["text"].startswith("data:image/png"))
+        self.assert_text_tiles_exact(image)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+# File: tests/test_json_gzip.py
+import asyncio
+import os
+import tempfile
+import unittest
+
+import httpx
+
+from benchmarks.fakes import SyntheticGrabber, install_fake_input_backend
+
+install_fake_input_backend()
+import main  # noqa: E402
+
+
+def request(method, path, **kwargs):
+    """One request against the app in-process (as in benchmarks/run_benchmarks.py)"""
+    async def send():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, path, **kwargs)
+    return asyncio.run(send())
+
+
+def pair():
+    """Run the pairing flow and return the session headers"""
+    code = request("GET", "/connection/generate-code").json()["code"]
+    response = request("POST", "/connection/request", json={"code": code, "device_info": "test"})
+    request("POST", "/connection/respond", json={"request_id": response.json()["request_id"], "accepted": True})
+    token = request("GET", f"/connection/status/{code}").json()["token"]
+    return {"Authorization": f"Bearer {token}", "Accept-Encoding": "gzip"}
+
+
+class JSONGZipTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        main.screen.grabber = SyntheticGrabber(1280, 720)
+        main.rate_limiter.limits = {}
+        cls.headers = pair()
+
+    def test_hybrid_frames_are_not_gzipped(self):
+        response = request("GET", "/mobile/screen", params={"encoder": "hybrid"}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/json"))
+        self.assertGreater(len(response.content), 4096)
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_large_listing_is_gzipped(self):
+        with tempfile.TemporaryDirectory() as path:
+            for i in range(200):
+                open(os.path.join(path, f"file-{i:04d}.txt"), "w").close()
+            response = request("GET", "/mobile/files/list", params={"path": path}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers.get("content-encoding"), "gzip")
+        self.assertEqual(len(response.json()["entries"]), 200)
+
+    def test_small_body_is_not_gzipped(self):
+        response = request("GET", "/system-metrics", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertIsInstance(response.json()["cpu_percent"], float)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+# File: tests/test_keyboard_injector.py
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from core.keyboard_injector import KeyboardInjector
+from core.session_store import SQLiteSessionStore
+
+
+class RecordingKeyboard:
+    """Backend that records what would have been typed"""
+    name = "recording"
+
+    def __init__(self):
+        self.typed = []
+
+    def type_text(self, text):
+        self.typed.append(text)
+        return 0
+
+    def press_combo(self, keys):
+        self.typed.append("+".join(keys))
+
+
+def make_injector(reorder_timeout=0.5, store=None, keyboard=None):
+    injector = KeyboardInjector(backend="pyautogui", reorder_timeout=reorder_timeout, store=store)
+    injector._backend = keyboard or RecordingKeyboard()
+    return injector
+
+
+class SerialSeqTests(unittest.TestCase):
+    """The keyboard WebSocket path (reorder=False)"""
+
+    def test_resent_seq_is_typed_after_early_one_is_refused(self):
+        injector = make_injector()
+        self.assertTrue(injector.inject([{"text": "a"}], "s", 1, reorder=False)["success"])
+
+        early = injector.inject([{"text": "c"}], "s", 3, reorder=False)
+        self.assertFalse(early["success"])
+        self.assertEqual(early["expected"], 2)
+
+        # The client resends from "expected"
+        self.assertTrue(injector.inject([{"text": "b"}], "s", 2, reorder=False)["success"])
+        self.assertTrue(injector.inject([{"text": "c"}], "s", 3, reorder=False)["success"])
+        self.assertEqual(injector.backend.typed, ["a", "b", "c"])
+
+    def test_refused_seq_is_not_consumed(self):
+        injector = make_injector()
+        injector.inject([{"text": "a"}], "s", 2, reorder=False)
+        result = injector.inject([{"text": "x"}], "s", 1, reorder=False)
+        self.assertTrue(result["success"])
+        self.assertNotIn("duplicate", result)
+        self.assertEqual(injector.backend.typed, ["x"])
+
+    def test_duplicate_is_acknowledged_once(self):
+        injector = make_injector()
+        injector.inject([{"text": "a"}], "s", 1, reorder=False)
+        result = injector.inject([{"text": "a"}], "s", 1, reorder=False)
+        self.assertTrue(result["success"])
+        self.assertTrue(result["duplicate"])
+        self.assertEqual(injector.backend.typed, ["a"])
+
+
+class ReorderSeqTests(unittest.TestCase):
+    """Concurrent HTTP requests (reorder=True)"""
+
+    def test_late_seq_arriving_in_time_is_typed_in_order(self):
+        injector = make_injector(reorder_timeout=2.0)
+        injector.inject([{"text": "a"}], "s", 1)
+        waiting = threading.Thread(target=injector.inject, args=([{"text": "c"}], "s", 3))
+        waiting.start()
+        injector.inject([{"text": "b"}], "s", 2)
+        waiting.join()
+        self.assertEqual(injector.backend.typed, ["a", "b", "c"])
+
+    def test_skipped_seq_is_refused_not_acknowledged(self):
+        injector = make_injector(reorder_timeout=0.05)
+        injector.inject([{"text": "a"}], "s", 1)
+        injector.inject([{"text": "c"}], "s", 3)  # gives up on seq 2
+
+        result = injector.inject([{"text": "b"}], "s", 2)
+        self.assertFalse(result["success"])
+        self.assertTrue(result["skipped"])
+        self.assertNotIn("duplicate", result)
+        self.assertEqual(injector.backend.typed, ["a", "c"])
+
+
+
+class SharedSeqTests(unittest.TestCase):
+    """Two workers: one injector each, one store and one keyboard between them"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="smartdesk-test-")
+        path = os.path.join(self.tmp, "sessions.db")
+        self.keyboard = RecordingKeyboard()
+        # Each worker opens the database itself
+        self.first = make_injector(0.05, SQLiteSessionStore(path), self.keyboard)
+        self.second = make_injector(0.05, SQLiteSessionStore(path), self.keyboard)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_interleaved_seqs_are_typed_once_in_order(self):
+        self.assertTrue(self.first.inject([{"text": "a"}], "s", 1, reorder=False)["success"])
+
+        early = self.second.inject([{"text": "c"}], "s", 3, reorder=False)
+        self.assertFalse(early["success"])
+        self.assertEqual(early["expected"], 2)
+
+        self.assertTrue(self.second.inject([{"text": "b"}], "s", 2, reorder=False)["success"])
+        self.assertTrue(self.first.inject([{"text": "c"}], "s", 3, reorder=False)["success"])
+
+        # A retry landing on the other worker is not typed again
+        retry = self.second.inject([{"text": "c"}], "s", 3, reorder=False)
+        self.assertTrue(retry["duplicate"])
+        self.assertEqual(self.keyboard.typed, ["a", "b", "c"])
+
+    def test_early_seq_waits_for_the_other_worker(self):
+        self.first.reorder_timeout = 2.0
+        self.first.inject([{"text": "a"}], "s", 1)
+        waiting = threading.Thread(target=self.first.inject, args=([{"text": "c"}], "s", 3))
+        waiting.start()
+        self.second.inject([{"text": "b"}], "s", 2)
+        waiting.join()
+        self.assertEqual(self.keyboard.typed, ["a", "b", "c"])
+
+    def test_seq_skipped_by_one_worker_is_refused_by_the_other(self):
+        self.first.inject([{"text": "a"}], "s", 1)
+        self.first.inject([{"text": "c"}], "s", 3)  # gives up on seq 2
+
+        result = self.second.inject([{"text": "b"}], "s", 2)
+        self.assertFalse(result["success"])
+        self.assertTrue(result["skipped"])
+        self.assertEqual(self.keyboard.typed, ["a", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# File: tests/test_session_stats.py
+import os
+import shutil
+import tempfile
+import unittest
+
+from core.session_stats import SessionStats
+from core.session_store import SQLiteSessionStore
+
+
+class SharedStatsTests(unittest.TestCase):
+    """Two workers counting one device's traffic"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="smartdesk-test-")
+        path = os.path.join(self.tmp, "sessions.db")
+        self.first = SessionStats(store=SQLiteSessionStore(path))
+        self.second = SessionStats(store=SQLiteSessionStore(path))
+        self.first.worker, self.second.worker = "1", "2"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_snapshot_adds_up_flushed_workers(self):
+        self.first.record_request("code", 0.010, 100)
+        self.first.record_input("code")
+        self.second.record_request("code", 0.030, 50)
+        self.second.record_frame("code", 1000)
+        self.second.flush()
+
+        stats = self.first.snapshot("code")
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["frames_sent"], 1)
+        self.assertEqual(stats["bytes_out"], 1150)
+        self.assertEqual(stats["input_events"], 1)
+        self.assertEqual(stats["latency_p99_ms"], 30.0)
+
+    def test_flush_replaces_instead_of_adding(self):
+        self.second.record_request("code", 0.010, 10)
+        self.second.flush()
+        self.second.record_request("code", 0.010, 10)
+        self.second.flush()
+        self.second.flush()
+        self.assertEqual(self.first.snapshot("code")["requests"], 2)
+
+    def test_retain_forgets_every_workers_counters(self):
+        self.second.record_request("gone", 0.010, 10)
+        self.second.flush()
+        self.first.retain(["code"])
+        self.assertIsNone(self.first.snapshot("gone"))
+
+
+if __name__ == "__main__":
+    unittest.main()